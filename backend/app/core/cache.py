@@ -8,12 +8,15 @@ For production, consider using Redis for distributed caching.
 import time
 import hashlib
 import asyncio
-from typing import Any, Optional, Callable, TypeVar
+import logging
+from typing import Any, Optional, Callable, Awaitable, TypeVar
 from functools import wraps
 from collections import OrderedDict
 
 T = TypeVar('T')
 
+logger = logging.getLogger(__name__)
+
 
 class Cache:
     """
@@ -21,6 +24,9 @@ class Cache:
 
     Features:
     - Automatic expiration of entries
+    - Stale-while-revalidate: after the TTL (soft expiry) an entry can still
+      be served for stale_ttl more seconds (hard expiry) while a single
+      background refresh recomputes it
     - LRU eviction when max size reached
     - Thread-safe operations
     - Async-compatible
@@ -33,12 +39,22 @@ class Cache:
         default_ttl: int = 300,  # 5 minutes default
         max_size: int = 1000,
         name: str = "cache",
+        stale_ttl: int = 0,  # No stale serving by default
     ):
         self.default_ttl = default_ttl
+        self.default_stale_ttl = stale_ttl
         self.max_size = max_size
         self.name = name
-        self._cache: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+        # key -> (value, soft expiry, hard expiry)
+        self._cache: OrderedDict[str, tuple[Any, float, float]] = OrderedDict()
         self._lock = asyncio.Lock()
+        # Background refreshes in flight, one per key
+        self._refreshing: dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
 
     def _is_expired(self, expiry: float) -> bool:
         """Check if an entry has expired."""
@@ -53,23 +69,50 @@ class Cache:
         """
         Get a value from cache.
 
-        Returns None if not found or expired.
+        Returns None if not found or expired (stale entries count as expired;
+        use lookup() to serve them).
+        """
+        value, stale = await self.lookup(key, allow_stale=False)
+        return value
+
+    async def lookup(self, key: str, allow_stale: bool = True) -> tuple[Optional[Any], bool]:
+        """
+        Get a value and whether it is stale (past its TTL, within stale_ttl).
+
+        Returns (None, False) if not found or hard-expired.
         """
         async with self._lock:
             if key not in self._cache:
-                return None
+                self.misses += 1
+                return None, False
 
-            value, expiry = self._cache[key]
+            value, expiry, stale_until = self._cache[key]
 
-            if self._is_expired(expiry):
+            if self._is_expired(stale_until):
                 del self._cache[key]
-                return None
+                self.misses += 1
+                return None, False
+
+            stale = self._is_expired(expiry)
+            if stale and not allow_stale:
+                self.misses += 1
+                return None, False
 
             # Move to end (LRU)
             self._cache.move_to_end(key)
-            return value
+            if stale:
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+            return value, stale
 
-    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: Optional[int] = None,
+        stale_ttl: Optional[int] = None,
+    ) -> None:
         """
         Set a value in cache.
 
@@ -77,16 +120,52 @@ class Cache:
             key: Cache key
             value: Value to cache
             ttl: Time-to-live in seconds (uses default if not specified)
+            stale_ttl: Seconds after the TTL during which lookup() still
+                serves the value as stale (uses default if not specified)
         """
         ttl = ttl if ttl is not None else self.default_ttl
+        stale_ttl = stale_ttl if stale_ttl is not None else self.default_stale_ttl
         expiry = time.time() + ttl
 
         async with self._lock:
+            self._cache.pop(key, None)
+
             # Evict oldest if at max size
             while len(self._cache) >= self.max_size:
                 self._cache.popitem(last=False)
 
-            self._cache[key] = (value, expiry)
+            self._cache[key] = (value, expiry, expiry + stale_ttl)
+
+    def refresh(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        ttl: Optional[int] = None,
+        stale_ttl: Optional[int] = None,
+    ) -> bool:
+        """
+        Recompute a (stale) entry in the background and store the result.
+
+        At most one refresh runs per key; returns False if one is already in
+        flight. Failures are logged and leave the stale value in place.
+        """
+        if key in self._refreshing:
+            return False
+
+        async def run():
+            try:
+                value = await compute()
+                if value is not None:
+                    await self.set(key, value, ttl, stale_ttl)
+            except Exception as e:
+                self.refresh_errors += 1
+                logger.warning(f"{self.name}: background refresh failed: {e}")
+            finally:
+                self._refreshing.pop(key, None)
+
+        self.refreshes += 1
+        self._refreshing[key] = asyncio.create_task(run())
+        return True
 
     async def delete(self, key: str) -> bool:
         """Delete a key from cache. Returns True if key existed."""
@@ -108,8 +187,8 @@ class Cache:
         now = time.time()
         async with self._lock:
             expired_keys = [
-                k for k, (_, expiry) in self._cache.items()
-                if now > expiry
+                k for k, (_, _, stale_until) in self._cache.items()
+                if now > stale_until
             ]
             for key in expired_keys:
                 del self._cache[key]
@@ -118,14 +197,80 @@ class Cache:
     def stats(self) -> dict:
         """Get cache statistics."""
         now = time.time()
-        active = sum(1 for _, (_, expiry) in self._cache.items() if now <= expiry)
+        active = sum(1 for _, (_, expiry, _) in self._cache.items() if now <= expiry)
+        stale = sum(
+            1 for _, (_, expiry, stale_until) in self._cache.items()
+            if expiry < now <= stale_until
+        )
+        lookups = self.hits + self.stale_hits + self.misses
         return {
             "name": self.name,
             "total_entries": len(self._cache),
             "active_entries": active,
-            "expired_entries": len(self._cache) - active,
+            "stale_entries": stale,
+            "expired_entries": len(self._cache) - active - stale,
             "max_size": self.max_size,
             "default_ttl": self.default_ttl,
+            "default_stale_ttl": self.default_stale_ttl,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0,
+            "refreshes": self.refreshes,
+            "refreshing": len(self._refreshing),
+            "refresh_errors": self.refresh_errors,
+        }
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into a single execution.
+
+    The first caller for a key starts the work in a task; callers arriving
+    while it is in flight await the same result (or exception) instead of
+    repeating it. Cancelling any one caller leaves the work running for the rest.
+
+    Usage:
+        flights = SingleFlight("embeddings")
+        vector = await flights.do(key, lambda: embed(text))
+    """
+
+    def __init__(self, name: str = "single_flight"):
+        self.name = name
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        """Run func() for key, or join an in-flight run for the same key."""
+        inflight = self._inflight.get(key)
+        if inflight is None:
+            # The work runs in its own task, so it outlives whichever caller started it
+            inflight = asyncio.ensure_future(func())
+            self._inflight[key] = inflight
+            inflight.add_done_callback(lambda task: self._finish(key, task))
+            self.executions += 1
+        else:
+            self.coalesced += 1
+
+        # Shield so a cancelled caller (the first one included) doesn't cancel
+        # the shared work for everyone else
+        return await asyncio.shield(inflight)
+
+    def _finish(self, key: str, task: asyncio.Future) -> None:
+        """Forget a finished run."""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Mark retrieved when every caller has gone
+
+    def stats(self) -> dict:
+        """Get coalescing statistics."""
+        return {
+            "name": self.name,
+            "in_flight": len(self._inflight),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
         }
 
 
@@ -133,6 +278,8 @@ def cached(
     cache: Cache,
     key_func: Optional[Callable[..., str]] = None,
     ttl: Optional[int] = None,
+    stale_while_revalidate: bool = False,
+    stale_ttl: Optional[int] = None,
 ):
     """
     Decorator for caching async function results.
@@ -141,6 +288,9 @@ def cached(
         cache: Cache instance to use
         key_func: Function to generate cache key from arguments
         ttl: Override TTL for this function
+        stale_while_revalidate: Serve expired values within the stale window
+            and recompute them in the background
+        stale_ttl: Override the cache's stale window for this function
 
     Example:
         @cached(search_cache, key_func=lambda q, t: f"{t}:{hash(q)}")
@@ -157,15 +307,17 @@ def cached(
                 key = cache._generate_key(*args, **kwargs)
 
             # Check cache
-            cached_value = await cache.get(key)
+            cached_value, stale = await cache.lookup(key, allow_stale=stale_while_revalidate)
             if cached_value is not None:
+                if stale:
+                    cache.refresh(key, lambda: func(*args, **kwargs), ttl, stale_ttl)
                 return cached_value
 
             # Execute function
             result = await func(*args, **kwargs)
 
             # Cache result
-            await cache.set(key, result, ttl)
+            await cache.set(key, result, ttl, stale_ttl)
 
             return result
 
@@ -175,10 +327,12 @@ def cached(
 
 # ==================== CACHE INSTANCES ====================
 
-# Search results cache (short TTL - results change with inventory)
+# Search results cache (keys carry the tenant's catalog revision, so
+# ingestion invalidates them). Entries hold product IDs and scores,
+# hydrated from the product store
 search_cache = Cache(
     default_ttl=300,  # 5 minutes
-    max_size=1000,
+    max_size=20000,
     name="search_cache",
 )
 
@@ -189,9 +343,17 @@ embedding_cache = Cache(
     name="embedding_cache",
 )
 
-# Query understanding cache (medium TTL)
+# Query understanding cache (medium TTL), parsed constraints per normalized query
 query_cache = Cache(
     default_ttl=600,  # 10 minutes
-    max_size=500,
+    max_size=5000,
     name="query_cache",
 )
+
+# Validation verdicts: does a product (by catalog version and text) satisfy
+# a constraint tuple. Keys change with product text, so entries stay valid
+verdict_cache = Cache(
+    default_ttl=86400,  # 1 day
+    max_size=50000,
+    name="verdict_cache",
+)
@@ -16,12 +16,50 @@ class Settings(BaseModel):
     EMBEDDING_MODEL: str = "text-embedding-3-small"
     CHAT_MODEL: str = "gpt-4o"
     VISION_MODEL: str = "gpt-4o"  # For image analysis
-    EMBEDDING_DIMENSIONS: int = 1536
+    EMBEDDING_DIMENSIONS: int = int(os.getenv("EMBEDDING_DIMENSIONS", "1536"))
+    # text-embedding-3 models can return shortened vectors (e.g. 512 or 256)
+    EMBEDDING_PROVIDER: Literal["openai", "hashing"] = os.getenv("EMBEDDING_PROVIDER", "openai")
+    # hashing: offline character n-gram vectors for tests, CI and load tests (no network)
+
+    # Embedding batching (ingestion)
+    EMBEDDING_BATCH_MAX_INPUTS: int = int(os.getenv("EMBEDDING_BATCH_MAX_INPUTS", "512"))
+    EMBEDDING_BATCH_MAX_TOKENS: int = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "100000"))
+    EMBEDDING_CONCURRENCY: int = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+    # Inputs per embeddings request are capped by count and estimated tokens;
+    # this many requests run in parallel during bulk ingestion
+
+    # Embedding store (persistent, content-addressed product embeddings)
+    EMBEDDING_STORE_ENABLED: bool = os.getenv("EMBEDDING_STORE_ENABLED", "true").lower() == "true"
+    EMBEDDING_STORE_PATH: str = os.getenv("EMBEDDING_STORE_PATH", ".cache/embedding_store.sqlite3")
+    EMBEDDING_STORE_MAX_ENTRIES: int = int(os.getenv("EMBEDDING_STORE_MAX_ENTRIES", "200000"))
 
     # Qdrant
     QDRANT_URL: str = os.getenv("QDRANT_URL", "")
     QDRANT_API_KEY: str = os.getenv("QDRANT_API_KEY", "")
     QDRANT_COLLECTION: str = "products"
+    QDRANT_LOCAL_PATH: str = os.getenv("QDRANT_LOCAL_PATH", ".cache/qdrant")
+    # Without QDRANT_URL, vectors persist here (":memory:" for a throwaway index).
+    # Local storage is locked to one process: stop the server before running scripts.
+    QDRANT_TENANCY: Literal["shared", "shard_key", "collection"] = os.getenv("QDRANT_TENANCY", "shared")
+    # shared: one collection, tenants separated by payload filter
+    # shard_key: one custom-sharded collection, a shard key per tenant (Qdrant server only)
+    # collection: one collection per tenant ("<QDRANT_COLLECTION>__<tenant_id>")
+    QDRANT_QUANTIZATION: Literal["none", "scalar", "binary"] = os.getenv("QDRANT_QUANTIZATION", "none")
+    QDRANT_QUANTIZATION_OVERSAMPLING: float = float(os.getenv("QDRANT_QUANTIZATION_OVERSAMPLING", "2.0"))
+    QDRANT_QUANTIZATION_RESCORE: bool = os.getenv("QDRANT_QUANTIZATION_RESCORE", "true").lower() == "true"
+    # scalar: int8 vectors in RAM (~4x smaller); binary: 1 bit per dimension (~32x smaller).
+    # Oversampled candidates are rescored with the original vectors.
+    QDRANT_UPSERT_BATCH_POINTS: int = int(os.getenv("QDRANT_UPSERT_BATCH_POINTS", "256"))
+    QDRANT_UPSERT_BATCH_BYTES: int = int(os.getenv("QDRANT_UPSERT_BATCH_BYTES", "8000000"))
+    QDRANT_UPSERT_PARALLEL: int = int(os.getenv("QDRANT_UPSERT_PARALLEL", "4"))
+    QDRANT_UPSERT_WAIT: bool = os.getenv("QDRANT_UPSERT_WAIT", "false").lower() == "true"
+    QDRANT_UPSERT_RETRIES: int = int(os.getenv("QDRANT_UPSERT_RETRIES", "3"))
+    # Bulk upserts are split into chunks (by points and estimated request bytes),
+    # sent PARALLEL at a time and retried on transient errors. Without WAIT, chunks
+    # are only queued by Qdrant and a final barrier waits until they are applied.
+    CATALOG_VERSION_CACHE_TTL: int = int(os.getenv("CATALOG_VERSION_CACHE_TTL", "5"))
+    # Seconds each worker caches a tenant's active catalog version; full syncs
+    # wait this long after switching versions before deleting the old one
 
     # Supabase
     SUPABASE_URL: str = os.getenv("SUPABASE_URL", "")
@@ -55,16 +93,54 @@ class Settings(BaseModel):
 
     RERANKING_ENABLED: bool = os.getenv("RERANKING_ENABLED", "false").lower() == "true"
     VALIDATION_ENABLED: bool = os.getenv("VALIDATION_ENABLED", "true").lower() == "true"
+    VALIDATION_ATTRIBUTES_ENABLED: bool = os.getenv("VALIDATION_ATTRIBUTES_ENABLED", "true").lower() == "true"
+    VALIDATION_ATTRIBUTE_MIN_CONFIDENCE: float = float(os.getenv("VALIDATION_ATTRIBUTE_MIN_CONFIDENCE", "0.85"))
+    # Extracted product attributes at or above this confidence decide clear
+    # matches/contradictions before the LLM; only ambiguous products reach it
+    QUERY_RULES_MIN_CONFIDENCE: float = float(os.getenv("QUERY_RULES_MIN_CONFIDENCE", "1.0"))
+    # Queries are parsed by rules first; below this share of understood tokens
+    # the LLM parses them instead (1.0: any unknown word escalates, 0: never)
 
     # Retrieval settings
     RETRIEVAL_CANDIDATES_MULTIPLIER: int = int(os.getenv("RETRIEVAL_CANDIDATES_MULTIPLIER", "2"))
     # Fetch this many extra candidates for reranking/validation buffer
+    RETRIEVAL_SPECULATIVE_SEARCH: bool = os.getenv("RETRIEVAL_SPECULATIVE_SEARCH", "true").lower() == "true"
+    # Search the raw query while query understanding runs; reused when the parsed
+    # intent and price/brand filters match, otherwise the search reruns
+
+    # Hybrid search: dense + sparse lexical vectors, fused server-side with RRF
+    SEARCH_MODE: Literal["dense", "hybrid"] = os.getenv("SEARCH_MODE", "hybrid")
+    HYBRID_PREFETCH_MULTIPLIER: int = int(os.getenv("HYBRID_PREFETCH_MULTIPLIER", "4"))
+    # Each leg fetches top_k * this many candidates before fusion
+    HYBRID_LEXICAL_TOP_N: int = int(os.getenv("HYBRID_LEXICAL_TOP_N", "3"))
+    # The lexical leg's best matches (exact SKUs, names, brands) are kept even
+    # when their dense similarity is below score_threshold
+    ATTRIBUTE_PAYLOAD_MIN_CONFIDENCE: float = float(os.getenv("ATTRIBUTE_PAYLOAD_MIN_CONFIDENCE", "0.85"))
+    # Extracted attributes (color, material, ...) at or above this confidence are
+    # stored as indexed payload fields, so color/material/gender constraints can
+    # filter inside the vector search
+
+    # Hot replica: small tenants' vectors held in process memory and searched with numpy
+    HOT_REPLICA_ENABLED: bool = os.getenv("HOT_REPLICA_ENABLED", "false").lower() == "true"
+    HOT_REPLICA_MAX_POINTS: int = int(os.getenv("HOT_REPLICA_MAX_POINTS", "5000"))
+    HOT_REPLICA_MAX_TENANTS: int = int(os.getenv("HOT_REPLICA_MAX_TENANTS", "50"))
+    HOT_REPLICA_TTL: int = int(os.getenv("HOT_REPLICA_TTL", "60"))
+    # Tenants above MAX_POINTS are searched in Qdrant; replicas reload every TTL seconds
+    # to pick up writes from other processes (this process's writes apply immediately)
 
     # Cache
     CACHE_ENABLED: bool = os.getenv("CACHE_ENABLED", "true").lower() == "true"
-    CACHE_TTL_SEARCH: int = int(os.getenv("CACHE_TTL_SEARCH", "300"))  # 5 minutes
+    CACHE_TTL_SEARCH: int = int(os.getenv("CACHE_TTL_SEARCH", "3600"))  # 1 hour; keys carry the catalog revision
+    CACHE_STALE_TTL_SEARCH: int = int(os.getenv("CACHE_STALE_TTL_SEARCH", "3600"))
+    # After CACHE_TTL_SEARCH, results are served stale this much longer while one
+    # background run recomputes them (0 = recompute inline on expiry)
     CACHE_TTL_EMBEDDING: int = int(os.getenv("CACHE_TTL_EMBEDDING", "3600"))  # 1 hour
     CACHE_TTL_QUERY: int = int(os.getenv("CACHE_TTL_QUERY", "600"))  # 10 minutes
+    CACHE_TTL_VERDICT: int = int(os.getenv("CACHE_TTL_VERDICT", "86400"))  # 1 day
+    # LLM validation verdicts per (catalog version, product text, constraints)
+    PRODUCT_STORE_MAX_ENTRIES: int = int(os.getenv("PRODUCT_STORE_MAX_ENTRIES", "50000"))
+    PRODUCT_STORE_TTL: int = int(os.getenv("PRODUCT_STORE_TTL", "300"))
+    # Product records that hydrate cached search results (which hold only IDs and scores)
 
     # Image Search
     IMAGE_SEARCH_ENABLED: bool = os.getenv("IMAGE_SEARCH_ENABLED", "true").lower() == "true"
@@ -29,6 +29,9 @@ async def lifespan(app: FastAPI):
     print(f"🔒 Rate limiting: {'enabled' if settings.RATE_LIMIT_ENABLED else 'disabled'}")
     yield
     # Shutdown
+    from app.services.vector_service import vector_service
+    # Releases the lock on local Qdrant storage
+    vector_service.qdrant.close()
     print("👋 Shutting down")
 
 
@@ -9,13 +9,17 @@ from typing import Optional
 import pandas as pd
 import json
 import io
+import asyncio
 
 from app.services.db_service import db_service
 from app.services.vector_service import vector_service
 from app.services.job_service import job_service
+from app.services.product_store import product_store
+from app.core.cache import search_cache, embedding_cache, query_cache, verdict_cache
+from app.services.rag.retriever import enhanced_retriever
 from app.services.woocommerce_service import WooCommerceService
 from app.services.ingestion import IngestionPipeline, create_fast_pipeline, create_full_pipeline
-from app.schemas.product import ProductRaw
+from app.schemas.product import ProductRaw, StockStatus
 from app.schemas.ingestion import JobType, JobStatus, ConnectorType
 
 router = APIRouter(prefix="/admin", tags=["admin"])
@@ -48,6 +52,16 @@ class ConnectorCreate(BaseModel):
     sync_frequency: str = "daily"
 
 
+class ProductFieldsUpdate(BaseModel):
+    id: str  # Product ID from the source catalog (external_id)
+    price: Optional[float] = None
+    stock_status: Optional[StockStatus] = None
+
+
+class ProductFieldsUpdateRequest(BaseModel):
+    updates: list[ProductFieldsUpdate]
+
+
 class AnalyticsResponse(BaseModel):
     total_searches: int
     unique_queries: int
@@ -180,8 +194,16 @@ def run_ingestion_job(
     raw_products: list[ProductRaw],
     connector_id: str = None,
     enrich_attributes: bool = False,
+    full_sync: bool = False,
 ):
-    """Background task to run the ingestion pipeline."""
+    """
+    Background task to run the ingestion pipeline.
+
+    With full_sync, the products replace the tenant's catalog: vectors are built
+    into a new catalog version that only goes live if every product was stored,
+    and products missing from the sync are then removed. An incomplete build is
+    discarded and the live catalog left as it was.
+    """
     try:
         # Start the job
         job_service.start_job(job_id, total_items=len(raw_products))
@@ -222,13 +244,21 @@ def run_ingestion_job(
                 except Exception as e:
                     result.warnings.append(f"Attributes upsert warning: {e}")
 
-            # Store in Qdrant (vectors)
+            # Store in Qdrant (vectors), with extracted attributes for payload filters
+            attributes_by_product: dict[str, dict] = {}
+            for a in result.attributes:
+                attributes_by_product.setdefault(a.product_id, {})[a.attribute_name] = {
+                    "value": a.attribute_value,
+                    "confidence": a.confidence,
+                }
             try:
                 vector_products = [
                     {
                         "id": p.external_id,
                         "tenant_id": p.tenant_id,
                         "name": p.name,
+                        "brand": p.brand,
+                        "sku": p.sku,
                         "price": p.price,
                         "short_description": p.short_description,
                         "image_url": p.image_url,
@@ -236,13 +266,41 @@ def run_ingestion_job(
                         "categories": p.categories,
                         "stock_status": p.stock_status,
                         "combined_text": p.embedding_text,
+                        # None (not enriched) vs {} (enriched, nothing extracted)
+                        "attributes": attributes_by_product.get(p.id, {}) if enrich_attributes else None,
                     }
                     for p in result.products
                 ]
-                vector_service.upsert_products_batch(vector_products)
+                if full_sync:
+                    # Build alongside the live catalog, then switch searches over
+                    version = vector_service.begin_catalog_build(tenant_id)
+                    try:
+                        stored = vector_service.upsert_products_batch(vector_products, version=version)
+                    except Exception:
+                        vector_service.discard_catalog_build(tenant_id, version)
+                        raise
+                    if stored == len(vector_products):
+                        vector_service.publish_catalog_build(tenant_id, version)
+                    else:
+                        vector_service.discard_catalog_build(tenant_id, version)
+                        result.warnings.append("Full sync not published: the new catalog is incomplete")
+                else:
+                    stored = vector_service.upsert_products_batch(vector_products, only_changed=True)
+                if stored < len(vector_products):
+                    result.warnings.append(
+                        f"Embedding failed for {len(vector_products) - stored} products"
+                    )
             except Exception as e:
+                stored = 0
                 result.warnings.append(f"Qdrant upsert warning: {e}")
 
+            # Remove products missing from a published full sync
+            if full_sync and stored == len(vector_products):
+                try:
+                    db_service.delete_stale_products(tenant_id, [p.external_id for p in result.products])
+                except Exception as e:
+                    result.warnings.append(f"Supabase stale product cleanup warning: {e}")
+
         # Update connector sync status if applicable
         if connector_id:
             try:
@@ -409,13 +467,6 @@ async def sync_woocommerce(
             )
             raw_products.append(raw)
 
-        # Clear existing products for this tenant (full sync)
-        vector_service.delete_tenant_products(request.tenant_id)
-        try:
-            db_service.delete_tenant_products(request.tenant_id)
-        except Exception:
-            pass
-
         # Create job
         job_id = job_service.create_job(
             tenant_id=request.tenant_id,
@@ -432,6 +483,7 @@ async def sync_woocommerce(
             raw_products,
             None,
             request.enrich_attributes,
+            True,  # full_sync: replaces the catalog once the new version is built
         )
 
         return {
@@ -533,3 +585,57 @@ async def get_products(tenant_id: str, limit: int = 100):
         return {"products": products, "count": len(products)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.patch("/products/{tenant_id}")
+async def update_product_fields(tenant_id: str, request: ProductFieldsUpdateRequest):
+    """
+    Apply price and stock changes without re-ingesting.
+
+    Updates Supabase rows and the stored vector payloads in bulk; nothing is
+    re-embedded. Meant for inventory feeds - a full sync still refreshes
+    embedding text that mentions price tier or availability.
+    """
+    updates = [u.model_dump(mode="json", exclude_none=True) for u in request.updates]
+    if not updates:
+        return {"success": True, "updated": 0, "not_found": [], "warnings": []}
+
+    warnings = []
+    try:
+        await asyncio.to_thread(db_service.update_product_fields, tenant_id, updates)
+    except Exception as e:
+        warnings.append(f"Supabase update warning: {e}")
+
+    try:
+        result = await asyncio.to_thread(vector_service.update_payload, tenant_id, updates)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {"success": not warnings, **result, "warnings": warnings}
+
+
+@router.get("/embedding-store/stats")
+async def get_embedding_store_stats():
+    """Get hit/miss and size statistics for the persistent embedding store."""
+    if not vector_service.embedding_store:
+        return {"enabled": False}
+    return {"enabled": True, **vector_service.embedding_store.stats()}
+
+
+@router.get("/hot-replicas/stats")
+async def get_hot_replica_stats():
+    """Get size and hit statistics for in-process tenant replicas."""
+    if not vector_service.hot_replicas:
+        return {"enabled": False}
+    return {"enabled": True, **vector_service.hot_replicas.stats()}
+
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Get hit/miss statistics for the in-memory caches."""
+    return {
+        "caches": [search_cache.stats(), embedding_cache.stats(), query_cache.stats(), verdict_cache.stats()],
+        "product_store": product_store.stats(),
+        "single_flight": [vector_service.query_flights.stats(), enhanced_retriever.flights.stats()],
+        "speculative_search": enhanced_retriever.speculation_stats(),
+    }
@@ -8,12 +8,14 @@ import re
 import time
 import logging
 from fastapi import APIRouter, HTTPException, Header
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
+from qdrant_client.models import FieldCondition, MatchAny
 
 from app.services.vector_service import vector_service
 from app.services.query_service import query_service
 from app.services.db_service import db_service
+from app.services.attributes import normalize_attribute_value
 from app.services.rag.retriever import enhanced_retriever
 from app.core.config import settings
 from app.core.security import injection_detector, sanitizer
@@ -21,6 +23,10 @@ from app.core.security import injection_detector, sanitizer
 router = APIRouter(prefix="/search", tags=["search"])
 logger = logging.getLogger(__name__)
 
+# Limits for one /search/batch request
+MAX_BATCH_QUERIES = 20
+MAX_BATCH_TOP_K = 50
+
 
 # ==================== REQUEST/RESPONSE MODELS ====================
 
@@ -58,6 +64,23 @@ class SearchResponse(BaseModel):
     latency_ms: int = 0
 
 
+class BatchSearchQuery(BaseModel):
+    query: str
+    categories: Optional[list[str]] = None  # Restrict to these categories (exact names)
+
+
+class BatchSearchRequest(BaseModel):
+    queries: list[BatchSearchQuery] = Field(max_length=MAX_BATCH_QUERIES)
+    tenant_id: str
+    top_k: int = Field(5, ge=1, le=MAX_BATCH_TOP_K)
+
+
+class BatchSearchResponse(BaseModel):
+    results: list[list[SearchResult]]  # One result list per query, in request order
+    count: int
+    latency_ms: int = 0
+
+
 class TrackClickRequest(BaseModel):
     search_event_id: int
     product_id: str
@@ -113,37 +136,39 @@ async def search_products(request: SearchRequest):
         # Step 3: Query understanding (optional)
         constraints_dict = None
         embedding_query = safe_query
+        qdrant_filters = None
+        has_soft_filters = False
 
         if request.use_query_understanding:
-            query_result = query_service.understand(safe_query)
+            query_result = await query_service.understand_async(safe_query)
             constraints_dict = query_result.constraints.to_dict()
             embedding_query = query_result.embedding_query
+            # Price, brand and attribute contradictions are enforced inside the vector search
+            qdrant_filters = query_result.constraints.to_qdrant_filters()
+            has_soft_filters = query_result.constraints.has_soft_filters()
 
-        # Step 4: Determine if we need extra candidates for post-filtering
-        has_filters = constraints_dict and any(
-            constraints_dict.get(k)
-            for k in ("budget_max", "budget_min", "color", "category", "material", "brand")
-        )
-        fetch_k = request.top_k * 3 if has_filters else request.top_k
+        # Step 4: Fetch extra candidates only for the constraints post-filtered below
+        fetch_k = request.top_k * 3 if has_soft_filters else request.top_k
 
         # Vector search with tenant filter
-        raw_results = vector_service.search(
+        raw_results = await vector_service.search(
             query=embedding_query,
             tenant_id=request.tenant_id,
             top_k=fetch_k,
+            filters=qdrant_filters,
         )
 
-        # Step 5: Apply constraint-based filtering
-        if constraints_dict and has_filters:
+        # Step 5: Apply loose text matching for category, color and material
+        if has_soft_filters:
+            color_constraint = (constraints_dict.get("color") or "").lower()
+            material_constraint = (constraints_dict.get("material") or "").lower()
+            # Values in the attribute vocabulary were filtered in Qdrant already
+            # (to_qdrant_filters); others ("teal", "mesh") are only checked here
+            color_filtered = normalize_attribute_value("color", color_constraint) is not None
+            material_filtered = normalize_attribute_value("material", material_constraint) is not None
+
             filtered_results = []
             for r in raw_results:
-                # Budget filter
-                price = r.get("price", 0)
-                if constraints_dict.get("budget_max") and price > constraints_dict["budget_max"]:
-                    continue
-                if constraints_dict.get("budget_min") and price < constraints_dict["budget_min"]:
-                    continue
-
                 # Build a searchable text blob from product fields
                 name_lower = (r.get("name") or "").lower()
                 desc_lower = (r.get("description") or "").lower()
@@ -162,19 +187,24 @@ async def search_products(request: SearchRequest):
                     if not cat_match:
                         continue
 
+                # Products with an extracted color/material passed the Qdrant
+                # attribute filter when there was one; the rest must mention the value
+                attributes = r.get("attributes") or {}
+
                 # Color filter (word boundary to avoid "red" matching "coloured")
-                color_constraint = (constraints_dict.get("color") or "").lower()
-                if color_constraint and not re.search(rf"\b{re.escape(color_constraint)}\b", product_text):
+                if (
+                    color_constraint
+                    and not (color_filtered and "color" in attributes)
+                    and not re.search(rf"\b{re.escape(color_constraint)}\b", product_text)
+                ):
                     continue
 
                 # Material filter (word boundary)
-                material_constraint = (constraints_dict.get("material") or "").lower()
-                if material_constraint and not re.search(rf"\b{re.escape(material_constraint)}\b", product_text):
-                    continue
-
-                # Brand filter (word boundary)
-                brand_constraint = (constraints_dict.get("brand") or "").lower()
-                if brand_constraint and not re.search(rf"\b{re.escape(brand_constraint)}\b", product_text):
+                if (
+                    material_constraint
+                    and not (material_filtered and "material" in attributes)
+                    and not re.search(rf"\b{re.escape(material_constraint)}\b", product_text)
+                ):
                     continue
 
                 filtered_results.append(r)
@@ -210,7 +240,7 @@ async def search_products(request: SearchRequest):
         # Step 8: Log search event for analytics
         search_event_id = None
         try:
-            event = db_service.log_search_event(
+            event = await db_service.log_search_event_async(
                 tenant_id=request.tenant_id,
                 query=request.query,
                 results_count=len(results),
@@ -244,7 +274,7 @@ async def track_click(request: TrackClickRequest):
     Use the search_event_id returned from the search response.
     """
     try:
-        db_service.track_click(request.search_event_id, request.product_id)
+        await db_service.track_click_async(request.search_event_id, request.product_id)
         return {"success": True}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -321,7 +351,7 @@ async def search_products_v2(request: SearchRequest):
         # Log search event for analytics (non-critical)
         search_event_id = None
         try:
-            event = db_service.log_search_event(
+            event = await db_service.log_search_event_async(
                 tenant_id=request.tenant_id,
                 query=request.query,
                 results_count=len(results),
@@ -367,7 +397,7 @@ async def search_with_api_key(
     The tenant_id will be derived from the API key.
     """
     # Validate API key
-    key_data = db_service.validate_api_key(x_api_key)
+    key_data = await db_service.validate_api_key_async(x_api_key)
     if not key_data:
         raise HTTPException(status_code=401, detail="Invalid API key")
 
@@ -403,7 +433,7 @@ async def quick_search(
     safe_query = sanitizer.sanitize_query(q)
 
     try:
-        raw_results = vector_service.search(
+        raw_results = await vector_service.search(
             query=safe_query,
             tenant_id=tenant_id,
             top_k=limit,
@@ -424,3 +454,84 @@ async def quick_search(
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+# ==================== BATCH SEARCH ====================
+
+
+@router.post("/batch", response_model=BatchSearchResponse)
+async def batch_search(request: BatchSearchRequest):
+    """
+    Run several searches for one tenant in a single call.
+
+    All queries are embedded in one OpenAI request and searched in one Qdrant
+    batch request - use this for pages that render many carousels or for
+    flows that need several related searches at once.
+    No query understanding (like /quick); each query may restrict categories.
+    """
+    start_time = time.time()
+
+    if not request.tenant_id.strip():
+        raise HTTPException(status_code=400, detail="tenant_id is required")
+
+    if not request.queries:
+        return BatchSearchResponse(results=[], count=0)
+
+    safe_queries = []
+    for q in request.queries:
+        if not q.query.strip():
+            raise HTTPException(status_code=400, detail="Query cannot be empty")
+
+        detection = injection_detector.detect(q.query)
+        if detection.risk_level == "high":
+            logger.warning(
+                f"High-risk injection attempt in batch search for tenant {request.tenant_id}: "
+                f"{detection.message}"
+            )
+            raise HTTPException(
+                status_code=400,
+                detail="Your search contains invalid content. Please rephrase your query."
+            )
+
+        safe_queries.append(sanitizer.sanitize_query(q.query))
+
+    filters = [
+        [FieldCondition(key="categories", match=MatchAny(any=q.categories))] if q.categories else None
+        for q in request.queries
+    ]
+
+    try:
+        raw_results = await vector_service.search_batch(
+            queries=safe_queries,
+            tenant_id=request.tenant_id,
+            top_k=request.top_k,
+            filters=filters,
+        )
+
+        results = [
+            [
+                SearchResult(
+                    product_id=r["product_id"],
+                    name=r["name"],
+                    price=r["price"],
+                    description=r.get("description"),
+                    image_url=r.get("image_url"),
+                    permalink=r.get("permalink"),
+                    categories=r.get("categories", []),
+                    stock_status=r.get("stock_status", "instock"),
+                    score=r.get("score", 0.0),
+                )
+                for r in query_results
+            ]
+            for query_results in raw_results
+        ]
+
+        return BatchSearchResponse(
+            results=results,
+            count=len(results),
+            latency_ms=int((time.time() - start_time) * 1000),
+        )
+
+    except Exception as e:
+        logger.error(f"Batch search error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
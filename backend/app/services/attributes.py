@@ -0,0 +1,54 @@
+"""
+Product Attributes
+Shared vocabulary for extracted product attributes.
+
+Ingestion (payload fields), query filters and result validation all compare
+attribute values through normalize_attribute_value, so they agree on what
+"blue" or "cotton" means. No third-party imports: the vector layer uses this.
+"""
+
+import re
+from typing import Optional
+
+
+# Closed vocabularies: free-form values ("Navy", "100% cotton") map onto one
+# of these terms, or to nothing. Only closed attributes are hard-filtered.
+ATTRIBUTE_VOCABULARY = {
+    "color": [
+        "red", "blue", "green", "black", "white", "pink", "yellow", "purple",
+        "orange", "brown", "gray", "navy", "beige", "gold", "silver",
+    ],
+    "material": [
+        "cotton", "leather", "silk", "wool", "polyester", "linen", "denim",
+        "velvet", "suede", "nylon", "cashmere",
+    ],
+    "gender": ["men", "women", "unisex", "kids"],
+}
+
+# Variants folded together before matching
+ATTRIBUTE_SYNONYMS = {
+    "grey": "gray",
+    "womens": "women", "woman": "women", "ladies": "women",
+    "mens": "men", "man": "men",
+    "kid": "kids", "children": "kids", "child": "kids",
+}
+
+
+def normalize_attribute_value(name: str, value: str) -> Optional[str]:
+    """
+    Canonical form of an attribute or constraint value.
+
+    For closed attributes (ATTRIBUTE_VOCABULARY) this is the single
+    vocabulary term the value mentions ("Light Blue" -> "blue", "100% cotton"
+    -> "cotton"), or None if it mentions none or several ("navy blue").
+    Other attributes are lowercased with whitespace collapsed.
+    """
+    text = " ".join(str(value).lower().replace("'", "").split())
+    text = ATTRIBUTE_SYNONYMS.get(text, text)
+    vocabulary = ATTRIBUTE_VOCABULARY.get(name)
+    if vocabulary is None:
+        return text or None
+
+    terms = {ATTRIBUTE_SYNONYMS.get(word, word) for word in re.findall(r"[a-z]+", text)}
+    matches = [term for term in vocabulary if term in terms]
+    return matches[0] if len(matches) == 1 else None
@@ -80,7 +80,7 @@ class ChatService:
         3. Generate response using only retrieved products
         """
         # Step 1 & 2: Retrieve relevant products (security filter applied)
-        products = vector_service.search(
+        products = await vector_service.search(
             query=query,
             tenant_id=tenant_id,
             top_k=5,
@@ -89,7 +89,7 @@ class ChatService:
 
         # Log the search for analytics
         try:
-            db_service.log_search(
+            await db_service.log_search_async(
                 tenant_id=tenant_id,
                 query=query,
                 results_count=len(products),
@@ -8,6 +8,8 @@ Handles Supabase operations for relational data:
 - Search Events (analytics)
 """
 
+import json
+import asyncio
 from supabase import create_client, Client
 from datetime import datetime, timedelta
 from typing import Optional
@@ -147,6 +149,80 @@ class DatabaseService:
         self._ensure_client()
         self.client.table("products").delete().eq("tenant_id", tenant_id).execute()
 
+    def update_product_fields(self, tenant_id: str, updates: list[dict]) -> int:
+        """
+        Update fields of existing products by external ID, e.g. price and stock.
+
+        Each update is {"id": external_id, **fields}. Products receiving the
+        same values are updated in one request. Returns rows updated.
+        """
+        self._ensure_client()
+
+        groups: dict[str, list[str]] = {}
+        for update in updates:
+            fields = {k: v for k, v in update.items() if k != "id" and v is not None}
+            if fields:
+                groups.setdefault(json.dumps(fields, sort_keys=True), []).append(
+                    f"{tenant_id}_{update['id']}"
+                )
+
+        updated = 0
+        for fields, ids in groups.items():
+            data = {**json.loads(fields), "updated_at": datetime.utcnow().isoformat()}
+            # Chunked to keep the id list within URL length limits
+            for i in range(0, len(ids), 200):
+                result = (
+                    self.client.table("products")
+                    .update(data)
+                    .eq("tenant_id", tenant_id)
+                    .in_("id", ids[i : i + 200])
+                    .execute()
+                )
+                updated += len(result.data) if result.data else 0
+        return updated
+
+    def delete_stale_products(self, tenant_id: str, keep_ids: list[str]) -> int:
+        """
+        Delete a tenant's products whose external ID is not in `keep_ids`.
+
+        Compares IDs rather than timestamps, so it doesn't depend on the app
+        and database clocks agreeing. Returns rows deleted.
+        """
+        self._ensure_client()
+
+        keep = {f"{tenant_id}_{product_id}" for product_id in keep_ids}
+        stale = []
+        # Paged: PostgREST caps the rows returned per request
+        page_size = 1000
+        offset = 0
+        while True:
+            result = (
+                self.client.table("products")
+                .select("id")
+                .eq("tenant_id", tenant_id)
+                .order("id")
+                .range(offset, offset + page_size - 1)
+                .execute()
+            )
+            rows = result.data or []
+            stale.extend(row["id"] for row in rows if row["id"] not in keep)
+            if len(rows) < page_size:
+                break
+            offset += page_size
+
+        deleted = 0
+        # Chunked to keep the id list within URL length limits
+        for i in range(0, len(stale), 200):
+            result = (
+                self.client.table("products")
+                .delete()
+                .eq("tenant_id", tenant_id)
+                .in_("id", stale[i : i + 200])
+                .execute()
+            )
+            deleted += len(result.data) if result.data else 0
+        return deleted
+
     # ==================== SEARCH LOG OPERATIONS (ROI Analytics) ====================
 
     def log_search(
@@ -374,6 +450,41 @@ class DatabaseService:
         )
         return result.data or []
 
+    def get_attributes_for_products(
+        self,
+        tenant_id: str,
+        product_ids: list[str],
+        min_confidence: float = 0.0,
+    ) -> dict[str, dict[str, dict]]:
+        """
+        Attributes of several products by external ID.
+
+        Returns {external_id: {attribute_name: {"value", "confidence"}}};
+        products without attributes are left out.
+        """
+        self._ensure_client()
+
+        prefix = f"{tenant_id}_"
+        ids = [f"{prefix}{product_id}" for product_id in dict.fromkeys(product_ids)]
+        attributes: dict[str, dict[str, dict]] = {}
+        # Chunked to keep the id list within URL length limits
+        for i in range(0, len(ids), 200):
+            result = (
+                self.client.table("product_attributes")
+                .select("product_id, attribute_name, attribute_value, confidence")
+                .eq("tenant_id", tenant_id)
+                .in_("product_id", ids[i : i + 200])
+                .gte("confidence", min_confidence)
+                .execute()
+            )
+            for row in result.data or []:
+                product_id = row["product_id"][len(prefix):]
+                attributes.setdefault(product_id, {})[row["attribute_name"]] = {
+                    "value": row["attribute_value"],
+                    "confidence": float(row["confidence"]),
+                }
+        return attributes
+
     def delete_product_attributes(self, product_id: str) -> None:
         """Delete all attributes for a product."""
         self._ensure_client()
@@ -624,6 +735,30 @@ class DatabaseService:
             "product_count": product_count,
         }
 
+    # ==================== ASYNC WRAPPERS ====================
+    # The Supabase client is synchronous. Request handlers use these so the
+    # network call runs in a worker thread instead of blocking the event loop.
+
+    async def log_search_async(self, **kwargs) -> dict:
+        """Non-blocking log_search()."""
+        return await asyncio.to_thread(self.log_search, **kwargs)
+
+    async def log_search_event_async(self, **kwargs) -> dict:
+        """Non-blocking log_search_event()."""
+        return await asyncio.to_thread(self.log_search_event, **kwargs)
+
+    async def track_click_async(self, search_event_id: int, product_id: str) -> None:
+        """Non-blocking track_click()."""
+        await asyncio.to_thread(self.track_click, search_event_id, product_id)
+
+    async def validate_api_key_async(self, raw_key: str) -> Optional[dict]:
+        """Non-blocking validate_api_key()."""
+        return await asyncio.to_thread(self.validate_api_key, raw_key)
+
+    async def get_attributes_for_products_async(self, *args, **kwargs) -> dict[str, dict[str, dict]]:
+        """Non-blocking get_attributes_for_products()."""
+        return await asyncio.to_thread(self.get_attributes_for_products, *args, **kwargs)
+
 
 # Singleton instance
 db_service = DatabaseService()
@@ -0,0 +1,131 @@
+"""
+Embedding Providers
+Backends that turn texts into vectors for VectorService.
+
+- openai: OpenAI embeddings API (default)
+- hashing: offline feature-hashed character n-grams (numpy). Deterministic and
+  network-free, for tests, CI and load tests - lexical, not semantic.
+
+Select with EMBEDDING_PROVIDER. Each provider has a `model` identifier that
+is part of every cache, store and content-hash key, so vectors from
+different providers never mix.
+"""
+
+import zlib
+from abc import ABC, abstractmethod
+
+import numpy as np
+from openai import OpenAI, AsyncOpenAI
+
+from app.core.config import settings
+
+
+def embedding_params() -> dict:
+    """Model (and shortened dimensions, where supported) for embeddings requests."""
+    params = {"model": settings.EMBEDDING_MODEL}
+    # Only text-embedding-3 models accept `dimensions`
+    if settings.EMBEDDING_MODEL.startswith("text-embedding-3"):
+        params["dimensions"] = settings.EMBEDDING_DIMENSIONS
+    return params
+
+
+class EmbeddingProvider(ABC):
+    """
+    Interface for embedding backends.
+
+    embed/embed_async take a non-empty batch of non-empty texts and return
+    one vector per text, in input order. Errors are raised, not swallowed -
+    VectorService isolates failing inputs.
+    """
+
+    model: str = ""
+
+    @abstractmethod
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        """Embed a batch of texts."""
+
+    @abstractmethod
+    async def embed_async(self, texts: list[str]) -> list[list[float]]:
+        """Embed a batch of texts without blocking the event loop."""
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """OpenAI embeddings API (sync client for ingestion, async for requests)."""
+
+    def __init__(self):
+        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        self.async_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        self.model = settings.EMBEDDING_MODEL
+
+    def _vectors(self, response, count: int) -> list[list[float]]:
+        # Results carry their input index; don't rely on response ordering
+        vectors: list[list[float]] = [None] * count
+        for item in response.data:
+            vectors[item.index] = item.embedding
+        return vectors
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        """Embed a batch of texts in a single OpenAI request."""
+        response = self.client.embeddings.create(input=texts, **embedding_params())
+        return self._vectors(response, len(texts))
+
+    async def embed_async(self, texts: list[str]) -> list[list[float]]:
+        """Embed a batch of texts in a single non-blocking OpenAI request."""
+        response = await self.async_client.embeddings.create(input=texts, **embedding_params())
+        return self._vectors(response, len(texts))
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    Offline embeddings from feature-hashed character n-grams.
+
+    Text is lowercased and whitespace-normalized; its character n-grams are
+    hashed into EMBEDDING_DIMENSIONS signed buckets and the result is
+    L2-normalized. Texts sharing words, stems or typos get high cosine
+    similarity, which is enough to exercise and benchmark the full
+    ingestion-to-search path reproducibly. No network, no model files.
+    """
+
+    NGRAM_SIZES = (3, 4, 5)
+
+    def __init__(self, dimensions: int = settings.EMBEDDING_DIMENSIONS):
+        self.dimensions = dimensions
+        self.model = "hashing-char-ngrams-v1"
+
+    def _embed_one(self, text: str) -> list[float]:
+        padded = f" {' '.join(text.lower().split())} "
+        grams = [
+            padded[i : i + n]
+            for n in self.NGRAM_SIZES
+            for i in range(len(padded) - n + 1)
+        ]
+
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        if grams:
+            hashes = np.fromiter(
+                (zlib.crc32(g.encode("utf-8")) for g in grams),
+                dtype=np.uint32,
+                count=len(grams),
+            )
+            # Low bits pick the bucket, the high bit the sign
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(vector, hashes % self.dimensions, signs)
+
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        """Embed texts locally."""
+        return [self._embed_one(text) for text in texts]
+
+    async def embed_async(self, texts: list[str]) -> list[list[float]]:
+        """Embed texts locally (cheap enough to run on the event loop)."""
+        return self.embed(texts)
+
+
+def create_embedding_provider(name: str = None) -> EmbeddingProvider:
+    """Create the configured (or named) embedding provider."""
+    name = name or settings.EMBEDDING_PROVIDER
+    if name == "hashing":
+        return HashingEmbeddingProvider()
+    return OpenAIEmbeddingProvider()
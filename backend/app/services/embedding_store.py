@@ -0,0 +1,193 @@
+"""
+Embedding Store
+Persistent, content-addressed cache of product embeddings.
+
+Vectors are keyed by a hash of (embedding model, dimensions, embedding text),
+so a product whose embedding text hasn't changed is never re-embedded -
+even across restarts and full catalog syncs.
+
+Backed by SQLite (stdlib) on local disk; entries are evicted least-recently-used
+once the store grows past its size cap.
+"""
+
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from array import array
+from pathlib import Path
+from typing import Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingStore:
+    """
+    SQLite-backed embedding store.
+
+    Features:
+    - Content-addressed keys (model + dimensions + text)
+    - float32 vector storage
+    - LRU eviction above max_entries
+    - Hit/miss counters
+    """
+
+    def __init__(
+        self,
+        path: str,
+        model: str,
+        max_entries: int = 200_000,
+        dimensions: int = settings.EMBEDDING_DIMENSIONS,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.model = model
+        self.dimensions = dimensions
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)"
+        )
+        self._conn.commit()
+
+    def key(self, text: str) -> str:
+        """Content address for an embedding text."""
+        key_data = f"{self.model}:{self.dimensions}:{text}"
+        return hashlib.sha256(key_data.encode()).hexdigest()
+
+    def get_many(self, texts: list[str]) -> list[Optional[list[float]]]:
+        """
+        Look up stored vectors for a list of texts.
+
+        Returns a list aligned with `texts`; None where there is no stored vector.
+        """
+        keys = [self.key(t) for t in texts]
+        found: dict[str, list[float]] = {}
+
+        with self._lock:
+            unique_keys = list(set(keys))
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(unique_keys), 500):
+                chunk = unique_keys[i : i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, k) for k in found],
+                )
+                self._conn.commit()
+
+            results = [found.get(k) for k in keys]
+            hits = sum(1 for r in results if r is not None)
+            self.hits += hits
+            self.misses += len(results) - hits
+
+        return results
+
+    def put_many(self, texts: list[str], vectors: list[list[float]]) -> None:
+        """Store vectors for texts, evicting the least recently used entries if full."""
+        now = time.time()
+        rows = [
+            (self.key(text), array("f", vector).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+            if vector is not None
+        ]
+        if not rows:
+            return
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                rows,
+            )
+            self._evict_if_needed()
+            self._conn.commit()
+
+    def _evict_if_needed(self) -> None:
+        """Drop least recently used entries above max_entries (caller holds lock)."""
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        overflow = count - self.max_entries
+        if overflow <= 0:
+            return
+
+        self._conn.execute(
+            """
+            DELETE FROM embeddings WHERE key IN (
+                SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?
+            )
+            """,
+            (overflow,),
+        )
+        self.evictions += overflow
+
+    def clear(self) -> int:
+        """Remove all entries. Returns count of removed entries."""
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            return count
+
+    def stats(self) -> dict:
+        """Get store statistics."""
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "name": "embedding_store",
+            "path": self.path,
+            "model": self.model,
+            "dimensions": self.dimensions,
+            "entries": count,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0,
+            "evictions": self.evictions,
+        }
+
+
+def create_embedding_store(model: str) -> Optional[EmbeddingStore]:
+    """Create the configured embedding store for `model`, or None if disabled/unavailable."""
+    if not settings.EMBEDDING_STORE_ENABLED:
+        return None
+
+    try:
+        return EmbeddingStore(
+            path=settings.EMBEDDING_STORE_PATH,
+            max_entries=settings.EMBEDDING_STORE_MAX_ENTRIES,
+            model=model,
+        )
+    except Exception as e:
+        logger.warning(f"Embedding store unavailable, embedding without it: {e}")
+        return None
@@ -0,0 +1,476 @@
+"""
+Hot Replica
+In-process copies of small tenants' catalogs, searched with numpy.
+
+A tenant catalog (one catalog namespace) with at most HOT_REPLICA_MAX_POINTS
+points is held in memory as a float32 matrix of unit vectors, a payload list
+and an inverted index of its sparse vectors. Searches are a matrix-vector
+product plus top-k - no network round trip to Qdrant.
+
+Scoring mirrors Qdrant: cosine for the dense leg, IDF-weighted dot product
+for the sparse leg and reciprocal rank fusion for hybrid queries. IDF comes
+from the replica's own documents rather than the whole collection, so hybrid
+rankings can differ slightly from Qdrant's. Filters are evaluated for the
+condition types the search path builds (match value/any/text, range,
+is-empty, nested Filters); anything else returns None and the caller falls back to Qdrant.
+
+Replicas are kept in sync with writes made by this process and reloaded
+every HOT_REPLICA_TTL seconds to pick up writes from other processes.
+"""
+
+import copy
+import math
+import re
+import time
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+from qdrant_client.models import (
+    Filter,
+    FieldCondition,
+    IsEmptyCondition,
+    MatchValue,
+    MatchAny,
+    MatchText,
+    Range,
+    ScoredPoint,
+    SparseVector,
+)
+
+from app.core.config import settings
+
+# Qdrant's reciprocal rank fusion constant: score = sum of 1 / (RRF_K + rank)
+RRF_K = 2
+
+# Word tokens, as Qdrant's full-text "word" tokenizer splits them
+WORD_PATTERN = re.compile(r"[^\W_]+")
+
+
+class UnsupportedFilter(Exception):
+    """A filter condition the replica can't evaluate (search falls back to Qdrant)."""
+
+
+def _as_list(conditions) -> list:
+    """Filter clauses may be a single condition or a list."""
+    if conditions is None:
+        return []
+    return conditions if isinstance(conditions, list) else [conditions]
+
+
+def _field_values(value) -> list:
+    """Payload values of a field; a condition on an array matches any element."""
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+class TenantReplica:
+    """
+    Immutable in-memory copy of one catalog namespace.
+
+    Writes return a new replica (with_upserts / without), so searches
+    running concurrently always see a consistent snapshot.
+    """
+
+    def __init__(
+        self,
+        ids: list,
+        vectors: list[list[float]],
+        sparse_vectors: list[Optional[SparseVector]],
+        payloads: list[dict],
+    ):
+        self.ids = ids
+        self.sparse_vectors = sparse_vectors
+        self.payloads = payloads
+        self._rows = {point_id: row for row, point_id in enumerate(ids)}
+
+        if ids:
+            matrix = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+        else:
+            matrix = np.zeros((0, settings.EMBEDDING_DIMENSIONS), dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        # Qdrant normalizes vectors for cosine distance; so does the replica
+        self.matrix = matrix / np.where(norms == 0, 1, norms)
+
+        # Sparse index -> (rows, weights), plus IDF as Qdrant computes it
+        postings: dict[int, tuple[list[int], list[float]]] = {}
+        for row, sparse in enumerate(sparse_vectors):
+            if sparse is None:
+                continue
+            for index, weight in zip(sparse.indices, sparse.values):
+                rows, weights = postings.setdefault(index, ([], []))
+                rows.append(row)
+                weights.append(weight)
+
+        n = len(ids)
+        self.postings = {
+            index: (
+                np.asarray(rows, dtype=np.int32),
+                np.asarray(weights, dtype=np.float32)
+                * math.log((n - len(rows) + 0.5) / (len(rows) + 0.5) + 1),
+            )
+            for index, (rows, weights) in postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the vectors."""
+        return self.matrix.nbytes + sum(r.nbytes + w.nbytes for r, w in self.postings.values())
+
+    # ==================== WRITES ====================
+
+    def with_upserts(
+        self,
+        ids: list,
+        vectors: list[list[float]],
+        sparse_vectors: list[Optional[SparseVector]],
+        payloads: list[dict],
+    ) -> "TenantReplica":
+        """A copy with points added or replaced."""
+        new_rows = {point_id: row for row, point_id in enumerate(ids)}
+        keep = [row for row, point_id in enumerate(self.ids) if point_id not in new_rows]
+        return TenantReplica(
+            [self.ids[row] for row in keep] + list(ids),
+            [*self.matrix[keep], *vectors],
+            [self.sparse_vectors[row] for row in keep] + list(sparse_vectors),
+            [self.payloads[row] for row in keep] + list(payloads),
+        )
+
+    def with_payloads(self, payloads: dict) -> "TenantReplica":
+        """A copy with partial payload updates (point ID -> fields) merged in."""
+        replica = copy.copy(self)
+        replica.payloads = [
+            {**payload, **payloads[point_id]} if point_id in payloads else payload
+            for point_id, payload in zip(self.ids, self.payloads)
+        ]
+        return replica
+
+    def without(self, point_ids: set) -> "TenantReplica":
+        """A copy with points removed."""
+        keep = [row for row, point_id in enumerate(self.ids) if point_id not in point_ids]
+        return TenantReplica(
+            [self.ids[row] for row in keep],
+            self.matrix[keep],
+            [self.sparse_vectors[row] for row in keep],
+            [self.payloads[row] for row in keep],
+        )
+
+    def contains_any(self, point_ids) -> bool:
+        """Whether any of the point IDs are in this replica."""
+        return any(point_id in self._rows for point_id in point_ids)
+
+    # ==================== FILTERS ====================
+
+    def _mask(self, condition) -> np.ndarray:
+        """Boolean row mask for a Filter or FieldCondition."""
+        if isinstance(condition, Filter):
+            if condition.min_should is not None:
+                raise UnsupportedFilter("min_should")
+            mask = np.ones(len(self), dtype=bool)
+            for c in _as_list(condition.must):
+                mask &= self._mask(c)
+            should = _as_list(condition.should)
+            if should:
+                mask &= np.logical_or.reduce([self._mask(c) for c in should])
+            for c in _as_list(condition.must_not):
+                mask &= ~self._mask(c)
+            return mask
+
+        if isinstance(condition, FieldCondition):
+            predicate = self._predicate(condition)
+            return np.fromiter(
+                (
+                    any(predicate(v) for v in _field_values(payload.get(condition.key)))
+                    for payload in self.payloads
+                ),
+                dtype=bool,
+                count=len(self),
+            )
+
+        if isinstance(condition, IsEmptyCondition):
+            # Missing, null or empty array
+            key = condition.is_empty.key
+            return np.fromiter(
+                (not _field_values(payload.get(key)) for payload in self.payloads),
+                dtype=bool,
+                count=len(self),
+            )
+
+        raise UnsupportedFilter(type(condition).__name__)
+
+    def _predicate(self, condition: FieldCondition):
+        """Per-value test for a field condition."""
+        match, bounds = condition.match, condition.range
+        others = (
+            condition.geo_bounding_box, condition.geo_radius, condition.geo_polygon,
+            condition.values_count, condition.is_empty, condition.is_null,
+        )
+        if (
+            any(other is not None for other in others)
+            or (match is None) == (bounds is None)
+            or (bounds is not None and not isinstance(bounds, Range))
+        ):
+            raise UnsupportedFilter(condition.key)
+
+        if bounds is not None:
+
+            def in_range(v) -> bool:
+                if isinstance(v, bool) or not isinstance(v, (int, float)):
+                    return False
+                return (
+                    (bounds.gt is None or v > bounds.gt)
+                    and (bounds.gte is None or v >= bounds.gte)
+                    and (bounds.lt is None or v < bounds.lt)
+                    and (bounds.lte is None or v <= bounds.lte)
+                )
+
+            return in_range
+
+        if isinstance(match, MatchValue):
+            return lambda v: v == match.value
+        if isinstance(match, MatchAny):
+            allowed = set(match.any)
+            return lambda v: v in allowed
+        if isinstance(match, MatchText):
+            # Full-text index (lowercase word tokens): every query token must appear
+            wanted = set(WORD_PATTERN.findall(match.text.lower()))
+            return lambda v: isinstance(v, str) and wanted <= set(WORD_PATTERN.findall(v.lower()))
+
+        raise UnsupportedFilter(condition.key)
+
+    # ==================== SEARCH ====================
+
+    def _top(self, scores: np.ndarray, candidates: np.ndarray, limit: int) -> np.ndarray:
+        """Rows of the highest-scoring candidates, best first."""
+        rows = np.flatnonzero(candidates)
+        if len(rows) > limit:
+            rows = rows[np.argpartition(-scores[rows], limit - 1)[:limit]]
+        return rows[np.argsort(-scores[rows], kind="stable")]
+
+    def search(
+        self,
+        query_vector: list[float],
+        sparse_query: Optional[SparseVector],
+        conditions: Optional[list],
+        top_k: int,
+        score_threshold: Optional[float],
+        prefetch_limit: int,
+    ) -> Optional[list[ScoredPoint]]:
+        """
+        Dense (or hybrid, with sparse_query) search under filter conditions.
+
+        Mirrors VectorService._build_query: hybrid legs fetch prefetch_limit
+        candidates each and are fused with RRF. Hits report dense cosine
+        similarity, and score_threshold drops hits below it from either leg,
+        except the HYBRID_LEXICAL_TOP_N best lexical matches.
+        Returns None if a condition can't be evaluated here.
+        """
+        try:
+            mask = self._mask(Filter(must=conditions)) if conditions else np.ones(len(self), dtype=bool)
+        except UnsupportedFilter:
+            return None
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        dense = self.matrix @ (query / norm if norm else query)
+
+        dense_candidates = mask if score_threshold is None else mask & (dense >= score_threshold)
+        if sparse_query is None or not sparse_query.indices:
+            rows = self._top(dense, dense_candidates, top_k)
+        else:
+            lexical = np.zeros(len(self), dtype=np.float32)
+            for index, value in zip(sparse_query.indices, sparse_query.values):
+                if index in self.postings:
+                    posting_rows, weights = self.postings[index]
+                    np.add.at(lexical, posting_rows, weights * value)
+
+            lexical_rows = self._top(lexical, mask & (lexical > 0), prefetch_limit).tolist()
+            fused: dict[int, float] = {}
+            for leg in (self._top(dense, dense_candidates, prefetch_limit).tolist(), lexical_rows):
+                for rank, row in enumerate(leg):
+                    fused[row] = fused.get(row, 0.0) + 1 / (RRF_K + rank)
+            rows = sorted(fused, key=fused.get, reverse=True)[:top_k]
+            if score_threshold is not None:
+                best_lexical = set(lexical_rows[: settings.HYBRID_LEXICAL_TOP_N])
+                rows = [row for row in rows if row in best_lexical or dense[row] >= score_threshold]
+
+        return [
+            ScoredPoint(id=self.ids[row], version=0, score=float(dense[row]), payload=self.payloads[row])
+            for row in rows
+        ]
+
+
+class HotReplicaCache:
+    """
+    Catalog namespace -> TenantReplica, LRU-bounded to HOT_REPLICA_MAX_TENANTS.
+
+    Loads happen outside (VectorService._load_replica) and are tagged with a
+    write generation: a load that raced with a local write is discarded, so
+    a snapshot read before the write can't replace the updated replica.
+    Replicas also carry the catalog revision they reflect: one behind the
+    revision a search sees (another process wrote) isn't served, and is
+    reloaded. Namespaces found too large are remembered for HOT_REPLICA_TTL
+    seconds.
+    """
+
+    def __init__(
+        self,
+        max_points: int = settings.HOT_REPLICA_MAX_POINTS,
+        max_tenants: int = settings.HOT_REPLICA_MAX_TENANTS,
+        ttl: int = settings.HOT_REPLICA_TTL,
+    ):
+        self.max_points = max_points
+        self.max_tenants = max_tenants
+        self.ttl = ttl
+        self._replicas: OrderedDict[str, tuple[TenantReplica, float]] = OrderedDict()
+        self._oversized: dict[str, float] = {}
+        self._loading: set[str] = set()
+        self._generations: dict[str, int] = {}
+        self._revisions: dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.fallbacks = 0
+
+    def get(self, namespace: str, revision: Optional[str]) -> Optional[TenantReplica]:
+        """The namespace's replica (possibly due for a reload), if loaded at `revision`."""
+        with self._lock:
+            entry = self._replicas.get(namespace)
+            if entry is None or self._revisions.get(namespace) != revision:
+                return None
+            self._replicas.move_to_end(namespace)
+            return entry[0]
+
+    def begin_load(self, namespace: str, revision: Optional[str]) -> Optional[int]:
+        """
+        Claim a (re)load of a namespace that is missing, older than the TTL or
+        loaded at another revision. Returns the write generation to pass to
+        put(), or None if no load is due.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._replicas.get(namespace)
+            if (
+                namespace in self._loading
+                or self._oversized.get(namespace, 0) > now
+                or (entry is not None and entry[1] > now and self._revisions.get(namespace) == revision)
+            ):
+                return None
+            self._loading.add(namespace)
+            return self._generations.get(namespace, 0)
+
+    def put(
+        self,
+        namespace: str,
+        replica: TenantReplica,
+        generation: int,
+        revision: Optional[str],
+    ) -> None:
+        """
+        Store a replica loaded at `revision` (read before the load started)
+        unless a local write happened during the load.
+        """
+        with self._lock:
+            self._loading.discard(namespace)
+            if self._generations.get(namespace, 0) != generation:
+                return
+            self._replicas[namespace] = (replica, time.monotonic() + self.ttl)
+            self._revisions[namespace] = revision
+            self._replicas.move_to_end(namespace)
+            while len(self._replicas) > self.max_tenants:
+                evicted, _ = self._replicas.popitem(last=False)
+                self._revisions.pop(evicted, None)
+
+    def advance_revision(self, namespace: str, previous: Optional[str], revision: Optional[str]) -> None:
+        """
+        Record a revision change made by this process's own (already applied)
+        write, if the replica was current before it.
+        """
+        with self._lock:
+            if namespace in self._replicas and self._revisions.get(namespace) == previous:
+                self._revisions[namespace] = revision
+
+    def mark_oversized(self, namespace: str) -> None:
+        """Remember that a namespace is too large to replicate."""
+        with self._lock:
+            self._loading.discard(namespace)
+            self._replicas.pop(namespace, None)
+            self._revisions.pop(namespace, None)
+            self._oversized[namespace] = time.monotonic() + self.ttl
+
+    def end_load(self, namespace: str) -> None:
+        """Release a load claim after a failed load."""
+        with self._lock:
+            self._loading.discard(namespace)
+
+    def apply_upsert(
+        self,
+        namespace: str,
+        ids: list,
+        vectors: list[list[float]],
+        sparse_vectors: list[Optional[SparseVector]],
+        payloads: list[dict],
+    ) -> None:
+        """Apply points written by this process to the namespace's replica."""
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            entry = self._replicas.get(namespace)
+            if entry is None:
+                return
+            replica = entry[0].with_upserts(ids, vectors, sparse_vectors, payloads)
+            if len(replica) > self.max_points:
+                del self._replicas[namespace]
+                self._revisions.pop(namespace, None)
+                self._oversized[namespace] = time.monotonic() + self.ttl
+            else:
+                self._replicas[namespace] = (replica, entry[1])
+
+    def apply_payload(self, namespace: str, payloads: dict) -> None:
+        """Apply partial payload updates (point ID -> fields) made by this process."""
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            entry = self._replicas.get(namespace)
+            if entry is not None and payloads:
+                self._replicas[namespace] = (entry[0].with_payloads(payloads), entry[1])
+
+    def apply_delete(self, point_ids: list) -> None:
+        """Remove deleted points from whichever replicas hold them."""
+        point_ids = set(point_ids)
+        with self._lock:
+            for namespace, (replica, expiry) in list(self._replicas.items()):
+                if replica.contains_any(point_ids):
+                    self._generations[namespace] = self._generations.get(namespace, 0) + 1
+                    self._replicas[namespace] = (replica.without(point_ids), expiry)
+            # Loads in flight may have read the deleted points
+            for namespace in self._loading:
+                self._generations[namespace] = self._generations.get(namespace, 0) + 1
+
+    def drop(self, namespace: str) -> None:
+        """Forget a namespace (deleted or replaced)."""
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            self._replicas.pop(namespace, None)
+            self._revisions.pop(namespace, None)
+            self._oversized.pop(namespace, None)
+
+    def namespaces(self) -> list[str]:
+        """Namespaces with a replica, loading or known oversized."""
+        with self._lock:
+            return list({*self._replicas, *self._loading, *self._oversized})
+
+    def stats(self) -> dict:
+        """Replica counts and memory, for monitoring."""
+        with self._lock:
+            replicas = [replica for replica, _ in self._replicas.values()]
+            return {
+                "tenants": len(replicas),
+                "points": sum(len(r) for r in replicas),
+                "bytes": sum(r.nbytes for r in replicas),
+                "oversized": len(self._oversized),
+                "hits": self.hits,
+                "fallbacks": self.fallbacks,
+            }
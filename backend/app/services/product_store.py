@@ -0,0 +1,96 @@
+"""
+Product Store
+Shared in-memory records of recently seen products, per tenant.
+
+Cached search results hold only (product_id, score) pairs; the product
+fields are hydrated from this store. Records are filled from search hits
+and from Qdrant on a miss (VectorService.get_products), and invalidated when
+ingestion changes a product in this process. Writes from other processes
+show up once an entry's TTL has passed.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from app.core.config import settings
+
+
+class ProductStore:
+    """
+    LRU store of product records keyed by (tenant_id, product_id).
+
+    Features:
+    - Batched get/put
+    - TTL per entry, LRU eviction above max_entries
+    - Invalidation by product or whole tenant
+    - Thread-safe (ingestion runs in worker threads)
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.PRODUCT_STORE_MAX_ENTRIES,
+        ttl: int = settings.PRODUCT_STORE_TTL,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._records: OrderedDict[tuple[str, str], tuple[dict, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, tenant_id: str, product_ids: list[str]) -> dict[str, dict]:
+        """Fresh records for the given products; missing or expired ones are left out."""
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for product_id in product_ids:
+                key = (tenant_id, product_id)
+                entry = self._records.get(key)
+                if entry is None or entry[1] < now:
+                    self._records.pop(key, None)
+                    self.misses += 1
+                    continue
+                self._records.move_to_end(key)
+                found[product_id] = entry[0]
+                self.hits += 1
+        return found
+
+    def put_many(self, tenant_id: str, records: list[dict]) -> None:
+        """Store records (each with a product_id)."""
+        expiry = time.monotonic() + self.ttl
+        with self._lock:
+            for record in records:
+                key = (tenant_id, record["product_id"])
+                self._records[key] = (record, expiry)
+                self._records.move_to_end(key)
+            while len(self._records) > self.max_entries:
+                self._records.popitem(last=False)
+
+    def invalidate(self, tenant_id: str, product_ids: Optional[list[str]] = None) -> None:
+        """Drop records for some products, or for the whole tenant."""
+        with self._lock:
+            if product_ids is not None:
+                for product_id in product_ids:
+                    self._records.pop((tenant_id, product_id), None)
+                return
+            for key in [key for key in self._records if key[0] == tenant_id]:
+                del self._records[key]
+
+    def stats(self) -> dict:
+        """Get store statistics."""
+        lookups = self.hits + self.misses
+        return {
+            "name": "product_store",
+            "entries": len(self._records),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0,
+        }
+
+
+# Singleton instance
+product_store = ProductStore()
@@ -3,13 +3,20 @@ Query Understanding Service
 Extracts structured constraints from natural language queries.
 """
 
+import re
 import json
 import time
-from typing import Optional
-from dataclasses import dataclass
-from openai import OpenAI
+import hashlib
+from typing import Optional, Union
+from dataclasses import dataclass, replace
+from openai import OpenAI, AsyncOpenAI
+from qdrant_client.models import (
+    FieldCondition, Filter, IsEmptyCondition, MatchAny, MatchText, MatchValue, PayloadField, Range,
+)
 
 from app.core.config import settings
+from app.core.cache import query_cache
+from app.services.attributes import ATTRIBUTE_VOCABULARY, normalize_attribute_value
 
 
 QUERY_UNDERSTANDING_PROMPT = """You are a search query analyzer for a retail product search engine. Given a user's natural language query, extract structured constraints.
@@ -41,6 +48,20 @@ Examples:
 Return JSON:
 """
 
+# ==================== RULE PARSER VOCABULARY ====================
+# Words the rule parser understands. A query made only of these (plus filler
+# and prices) is parsed without the LLM; see QueryService._rule_confidence.
+
+RULE_GENDERS = {
+    "women": ["women", "womens", "woman", "ladies", "her", "girlfriend", "wife"],
+    "men": ["men", "mens", "man", "guys", "him", "boyfriend", "husband"],
+    "kids": ["kids", "children", "child", "boys", "girls"],
+}
+RULE_CATEGORIES = ["shoes", "dress", "shirt", "pants", "jacket", "bag", "watch", "jewelry"]
+RULE_COLORS = ["red", "blue", "green", "black", "white", "pink", "yellow", "purple", "orange", "brown", "gray", "navy", "beige"]
+RULE_BUDGET_WORDS = {"under", "less", "than", "below", "max", "over", "more", "above", "min", "to", "between", "usd", "dollars"}
+RULE_FILLER_WORDS = {"a", "an", "the", "and", "or", "for", "with", "in", "of", "my", "some", "any", "i", "me", "need", "want", "looking", "show", "find"}
+
 
 @dataclass
 class QueryConstraints:
@@ -69,38 +90,52 @@ class QueryConstraints:
             self.gender,
         ])
 
-    def to_qdrant_filters(self) -> list[dict]:
-        """Convert constraints to Qdrant filter conditions."""
+    def to_qdrant_filters(self) -> list[Union[FieldCondition, Filter]]:
+        """
+        Convert hard constraints to Qdrant filter conditions.
+
+        Price and brand are pushed down into the vector search (both have
+        payload indexes). Color, material and gender (closed vocabularies, see
+        app.services.attributes) exclude only products whose normalized
+        extracted attribute names a different term: products without that
+        attribute, or mentioning the value in name or description, still
+        match. Constraints outside the vocabulary add no filter. Category is
+        matched loosely against product text by callers.
+        """
         filters = []
 
-        if self.budget_max:
-            filters.append({
-                "key": "price",
-                "range": {"lte": self.budget_max}
-            })
-
-        if self.budget_min:
-            filters.append({
-                "key": "price",
-                "range": {"gte": self.budget_min}
-            })
-
-        # For text fields, we'd use Match conditions
-        # Note: These require payload indexes in Qdrant
-        if self.category:
-            filters.append({
-                "key": "categories",
-                "match": {"any": [self.category.lower()]}
-            })
+        if self.budget_min or self.budget_max:
+            filters.append(FieldCondition(
+                key="price",
+                range=Range(gte=self.budget_min or None, lte=self.budget_max or None),
+            ))
 
         if self.brand:
-            filters.append({
-                "key": "brand",
-                "match": {"value": self.brand.lower()}
-            })
+            brand = self.brand.lower().strip()
+            # Brand field when the catalog has one, otherwise the product name
+            filters.append(Filter(should=[
+                FieldCondition(key="brand", match=MatchValue(value=brand)),
+                FieldCondition(key="name", match=MatchText(text=brand)),
+            ]))
+
+        for field in ATTRIBUTE_VOCABULARY:
+            value = normalize_attribute_value(field, getattr(self, field) or "")
+            if not value:
+                continue
+            values = [value, "unisex"] if field == "gender" and value in ("men", "women") else [value]
+            filters.append(Filter(should=[
+                FieldCondition(key=field, match=MatchAny(any=values)),
+                IsEmptyCondition(is_empty=PayloadField(key=field)),
+                FieldCondition(key="name", match=MatchText(text=value)),
+                FieldCondition(key="description", match=MatchText(text=value)),
+            ]))
 
         return filters
 
+    def has_soft_filters(self) -> bool:
+        """Check if there are constraints that must be post-filtered outside Qdrant."""
+        return any([self.category, self.color, self.material])
+
     def to_dict(self) -> dict:
         """Convert to dictionary."""
         return {
@@ -124,6 +159,9 @@ class QueryResult:
     constraints: QueryConstraints
     embedding_query: str  # The query to embed (could be modified)
     latency_ms: int
+    tier: str = "rules"  # "rules" or "llm": which parser produced the constraints
+    confidence: float = 1.0  # Share of query tokens the rule parser accounted for
+    cache_hit: bool = False
 
 
 class QueryService:
@@ -133,8 +171,10 @@ class QueryService:
         self.use_llm = use_llm
         if settings.OPENAI_API_KEY:
             self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+            self.async_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
         else:
             self.client = None
+            self.async_client = None
 
     def understand(self, query: str) -> QueryResult:
         """
@@ -151,12 +191,65 @@ class QueryService:
         # Clean query
         query = query.strip()
 
-        # If LLM is disabled or unavailable, use simple parsing
-        if not self.use_llm or not self.client:
-            constraints = self._simple_parse(query)
-        else:
-            constraints = self._llm_parse(query)
+        # Rules first; the LLM only sees queries the rules can't fully explain
+        constraints = self._simple_parse(query)
+        confidence = self._rule_confidence(query, constraints)
+        tier = "rules"
+        if self._should_escalate(confidence, self.client):
+            llm_constraints = self._llm_parse(query)
+            if llm_constraints:
+                constraints, tier = llm_constraints, "llm"
+
+        return self._build_result(query, constraints, start_time, tier, confidence)
 
+    async def understand_async(self, query: str) -> QueryResult:
+        """
+        Non-blocking understand() for use on the request path.
+
+        Parsed constraints are cached per normalized query in query_cache.
+        """
+        start_time = time.time()
+
+        query = query.strip()
+
+        cache_key = self._cache_key(query)
+        cached = await query_cache.get(cache_key)
+        if cached:
+            constraints, tier, confidence = cached
+            return self._build_result(query, replace(constraints), start_time, tier, confidence, cache_hit=True)
+
+        constraints = self._simple_parse(query)
+        confidence = self._rule_confidence(query, constraints)
+        tier = "rules"
+        if self._should_escalate(confidence, self.async_client):
+            llm_constraints = await self._llm_parse_async(query)
+            if not llm_constraints:
+                # Don't cache the rule fallback: retry the LLM next time
+                return self._build_result(query, constraints, start_time, tier, confidence)
+            constraints, tier = llm_constraints, "llm"
+
+        await query_cache.set(cache_key, (replace(constraints), tier, confidence), settings.CACHE_TTL_QUERY)
+        return self._build_result(query, constraints, start_time, tier, confidence)
+
+    def guess(self, query: str) -> QueryConstraints:
+        """
+        Instant rules-only parse of a query.
+
+        Lets callers start work (e.g. a speculative search) before
+        understand_async() returns; the final constraints may differ.
+        """
+        return self._simple_parse(query.strip())
+
+    def _build_result(
+        self,
+        query: str,
+        constraints: QueryConstraints,
+        start_time: float,
+        tier: str,
+        confidence: float,
+        cache_hit: bool = False,
+    ) -> QueryResult:
+        """Assemble a QueryResult from parsed constraints."""
         # Use search_intent for embedding if extracted, otherwise original query
         embedding_query = constraints.search_intent or query
 
@@ -167,41 +260,113 @@ class QueryService:
             constraints=constraints,
             embedding_query=embedding_query,
             latency_ms=latency_ms,
+            tier=tier,
+            confidence=confidence,
+            cache_hit=cache_hit,
         )
 
-    def _llm_parse(self, query: str) -> QueryConstraints:
-        """Use LLM to extract constraints from query."""
+    def _cache_key(self, query: str) -> str:
+        """Cache key for a query, ignoring case and whitespace differences."""
+        normalized = " ".join(query.lower().split())
+        return f"query:{hashlib.sha256(normalized.encode()).hexdigest()[:32]}"
+
+    def _should_escalate(self, confidence: float, client) -> bool:
+        """Whether the LLM parser should replace the rule parse."""
+        return self.use_llm and client is not None and confidence < settings.QUERY_RULES_MIN_CONFIDENCE
+
+    def _tokenize(self, query: str) -> list[str]:
+        """Lowercase word and number tokens ("women's" -> "womens")."""
+        return re.findall(r"[a-z]+|\d+(?:\.\d+)?", query.lower().replace("'", ""))
+
+    def _singular(self, token: str) -> str:
+        """Naive singular form, so "jackets" matches "jacket"."""
+        if token.endswith("es") and token[:-2] in RULE_CATEGORIES:
+            return token[:-2]
+        if token.endswith("s") and token[:-1] in RULE_CATEGORIES:
+            return token[:-1]
+        return token
+
+    def _rule_confidence(self, query: str, constraints: QueryConstraints) -> float:
+        """
+        Share of query tokens the rule parser accounted for (0.0-1.0).
+
+        Tokens count when they are known categories, colors, gender words,
+        price phrases (numbers only if a budget was extracted) or filler.
+        Anything else (e.g. "hoodie", "waterproof") may carry a constraint the
+        rules can't see, and so does a second category, color or gender ("red
+        or blue shirt"): the parser keeps only one value per field.
+        """
+        tokens = self._tokenize(query)
+        if not tokens:
+            return 1.0
+
+        has_budget = constraints.budget_min is not None or constraints.budget_max is not None
+        known = RULE_BUDGET_WORDS | RULE_FILLER_WORDS
+
+        # Field values each token stands for; only the value kept is accounted for
+        values = {category: ("category", category) for category in RULE_CATEGORIES}
+        values.update({color: ("color", color) for color in RULE_COLORS})
+        values.update({word: ("gender", gender) for gender, words in RULE_GENDERS.items() for word in words})
+
+        accounted = 0
+        for token in tokens:
+            token = self._singular(token)
+            if token in values:
+                field, value = values[token]
+                accounted += getattr(constraints, field) == value
+            elif token in known or (token[0].isdigit() and has_budget):
+                accounted += 1
+        return round(accounted / len(tokens), 3)
+
+    def _llm_request(self, query: str) -> dict:
+        """Chat completion arguments for LLM constraint extraction."""
+        return {
+            "model": "gpt-4o-mini",
+            "messages": [
+                {"role": "system", "content": "You extract search constraints from queries. Return only JSON."},
+                {"role": "user", "content": QUERY_UNDERSTANDING_PROMPT.format(query=query)},
+            ],
+            "temperature": 0.1,
+            "max_tokens": 300,
+            "response_format": {"type": "json_object"},
+        }
+
+    def _parse_llm_response(self, content: str, query: str) -> QueryConstraints:
+        """Build constraints from the LLM's JSON response."""
+        data = json.loads(content)
+
+        return QueryConstraints(
+            budget_min=data.get("budget_min"),
+            budget_max=data.get("budget_max"),
+            category=data.get("category"),
+            brand=data.get("brand"),
+            color=data.get("color"),
+            material=data.get("material"),
+            style=data.get("style"),
+            occasion=data.get("occasion"),
+            gender=data.get("gender"),
+            search_intent=data.get("search_intent", query),
+        )
+
+    def _llm_parse(self, query: str) -> Optional[QueryConstraints]:
+        """Use LLM to extract constraints from query. Returns None on failure."""
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "You extract search constraints from queries. Return only JSON."},
-                    {"role": "user", "content": QUERY_UNDERSTANDING_PROMPT.format(query=query)},
-                ],
-                temperature=0.1,
-                max_tokens=300,
-                response_format={"type": "json_object"},
-            )
-
-            content = response.choices[0].message.content
-            data = json.loads(content)
-
-            return QueryConstraints(
-                budget_min=data.get("budget_min"),
-                budget_max=data.get("budget_max"),
-                category=data.get("category"),
-                brand=data.get("brand"),
-                color=data.get("color"),
-                material=data.get("material"),
-                style=data.get("style"),
-                occasion=data.get("occasion"),
-                gender=data.get("gender"),
-                search_intent=data.get("search_intent", query),
-            )
+            response = self.client.chat.completions.create(**self._llm_request(query))
+            return self._parse_llm_response(response.choices[0].message.content, query)
 
         except Exception as e:
             print(f"LLM query parsing failed: {e}")
-            return self._simple_parse(query)
+            return None
+
+    async def _llm_parse_async(self, query: str) -> Optional[QueryConstraints]:
+        """Non-blocking _llm_parse()."""
+        try:
+            response = await self.async_client.chat.completions.create(**self._llm_request(query))
+            return self._parse_llm_response(response.choices[0].message.content, query)
+
+        except Exception as e:
+            print(f"LLM query parsing failed: {e}")
+            return None
 
     def _simple_parse(self, query: str) -> QueryConstraints:
         """Simple rule-based query parsing (fast, no LLM)."""
@@ -209,8 +374,6 @@ class QueryService:
         query_lower = query.lower()
 
         # Budget extraction
-        import re
-
         # "under $50", "less than 50", "below $100"
         under_match = re.search(r'(?:under|less than|below|max|<)\s*\$?(\d+)', query_lower)
         if under_match:
@@ -227,25 +390,24 @@ class QueryService:
             constraints.budget_min = float(range_match.group(1))
             constraints.budget_max = float(range_match.group(2))
 
+        # Whole words only, so "men" doesn't match "women" or "red" "shredded"
+        tokens = {self._singular(token) for token in self._tokenize(query)}
+
         # Gender
-        if any(w in query_lower for w in ["women", "womens", "woman", "ladies", "her", "girlfriend", "wife"]):
-            constraints.gender = "women"
-        elif any(w in query_lower for w in ["men", "mens", "man", "guys", "him", "boyfriend", "husband"]):
-            constraints.gender = "men"
-        elif any(w in query_lower for w in ["kids", "children", "child", "boys", "girls"]):
-            constraints.gender = "kids"
+        for gender, words in RULE_GENDERS.items():
+            if tokens.intersection(words):
+                constraints.gender = gender
+                break
 
         # Common categories
-        categories = ["shoes", "dress", "shirt", "pants", "jacket", "bag", "watch", "jewelry"]
-        for cat in categories:
-            if cat in query_lower:
+        for cat in RULE_CATEGORIES:
+            if cat in tokens:
                 constraints.category = cat
                 break
 
         # Colors
-        colors = ["red", "blue", "green", "black", "white", "pink", "yellow", "purple", "orange", "brown", "gray", "navy", "beige"]
-        for color in colors:
-            if color in query_lower:
+        for color in RULE_COLORS:
+            if color in tokens:
                 constraints.color = color
                 break
 
@@ -9,20 +9,27 @@ Strategies:
 """
 
 import time
+import asyncio
 import logging
+import difflib
 from typing import Optional, Literal
 from pydantic import BaseModel
 
 from app.core.config import settings
-from app.core.cache import search_cache, cached
+from app.core.cache import search_cache, cached, SingleFlight
 from app.core.security import sanitizer, injection_detector
 from app.services.vector_service import vector_service
-from app.services.query_service import query_service, QueryConstraints as QSConstraints
+from app.services.db_service import db_service
+from app.services.query_service import query_service, QueryResult, QueryConstraints as QSConstraints
 from app.services.rag.validator import ResultValidator, ValidationSummary, QueryConstraints
 from app.services.rag.reranker import LLMReranker
 
 logger = logging.getLogger(__name__)
 
+# A speculative raw-query search is reused when the parsed search intent is at
+# least this similar to the query (difflib ratio on normalized text)
+SPECULATION_MIN_SIMILARITY = 0.9
+
 
 class RetrievalResult(BaseModel):
     """Result of enhanced retrieval."""
@@ -60,6 +67,12 @@ class EnhancedRetriever:
     def __init__(self):
         self.validator = ResultValidator()
         self.reranker = LLMReranker()
+        # Coalesces concurrent identical retrievals (keyed like the cache)
+        self.flights = SingleFlight("retrieval")
+        # Speculative searches whose results were not used, still finishing
+        self._discarded: set[asyncio.Task] = set()
+        self.speculation_hits = 0
+        self.speculation_misses = 0
 
     def _convert_constraints(self, qs_constraints: QSConstraints) -> QueryConstraints:
         """Convert QueryService constraints to validator constraints."""
@@ -81,12 +94,33 @@ class EnhancedRetriever:
         tenant_id: str,
         top_k: int,
         strategy: str,
+        revision: str,
     ) -> str:
-        """Generate a cache key for the retrieval."""
+        """
+        Generate a cache key for the retrieval.
+
+        Keys include the tenant's catalog revision, so entries from before an
+        ingestion are never hit again and age out of the LRU.
+        """
         import hashlib
-        key_data = f"{tenant_id}:{strategy}:{top_k}:{query}"
+        key_data = f"{tenant_id}:{revision}:{strategy}:{top_k}:{query}"
         return f"retrieve:{hashlib.sha256(key_data.encode()).hexdigest()[:32]}"
 
+    async def _hydrate(self, tenant_id: str, hits: list[tuple[str, float]]) -> list[dict]:
+        """
+        Rebuild cached results from (product_id, score) pairs.
+
+        Product fields come from the shared product store (or Qdrant on a
+        miss), so they reflect the latest ingestion. Products deleted since
+        the result was cached are dropped.
+        """
+        records = await vector_service.get_products(tenant_id, [product_id for product_id, _ in hits])
+        return [
+            {"score": score, **records[product_id]}
+            for product_id, score in hits
+            if product_id in records
+        ]
+
     async def retrieve(
         self,
         query: str,
@@ -116,54 +150,95 @@ class EnhancedRetriever:
         strategy = strategy or settings.RAG_STRATEGY
 
         # Step 1: Check cache
-        cache_key = self._generate_cache_key(query, tenant_id, top_k, strategy)
-        if use_cache and settings.CACHE_ENABLED:
-            cached_result = await search_cache.get(cache_key)
+        revision = await vector_service.get_catalog_revision(tenant_id)
+        cache_key = self._generate_cache_key(query, tenant_id, top_k, strategy, revision)
+        flight_key = f"{cache_key}:{use_query_understanding}"
+        caching = use_cache and settings.CACHE_ENABLED
+        if caching:
+            cached_result, stale = await search_cache.lookup(cache_key)
             if cached_result:
                 logger.debug(f"Cache hit for query: {query[:50]}...")
-                cached_result["cache_hit"] = True
-                cached_result["latency_ms"] = int((time.time() - start_time) * 1000)
-                return RetrievalResult(**cached_result)
+                if stale:
+                    # Serve the stale result; one background run replaces it
+                    search_cache.refresh(
+                        cache_key,
+                        lambda: self._refresh_entry(
+                            flight_key, query, tenant_id, top_k, strategy, use_query_understanding
+                        ),
+                        settings.CACHE_TTL_SEARCH,
+                        settings.CACHE_STALE_TTL_SEARCH,
+                    )
+                results = await self._hydrate(tenant_id, cached_result["hits"])
+                return RetrievalResult(
+                    results=results,
+                    count=len(results),
+                    query_understanding=cached_result["query_understanding"],
+                    validation_summary=cached_result["validation_summary"],
+                    strategy_used=cached_result["strategy_used"],
+                    latency_ms=int((time.time() - start_time) * 1000),
+                    cache_hit=True,
+                )
 
-        # Step 2: Query understanding
-        constraints_dict = None
-        embedding_query = query
-        qs_constraints = None
+        # Steps 2-5 run once per key at a time: identical concurrent requests
+        # (e.g. a traffic burst) share one execution instead of each calling the LLM
+        result_data = await self.flights.do(
+            flight_key,
+            lambda: self._run_pipeline(
+                query,
+                tenant_id,
+                top_k,
+                strategy,
+                use_query_understanding,
+                cache_key if caching else None,
+            ),
+        )
 
-        if use_query_understanding:
-            query_result = query_service.understand(query)
-            constraints_dict = query_result.constraints.to_dict()
-            embedding_query = query_result.embedding_query
-            qs_constraints = query_result.constraints
+        return RetrievalResult(
+            **result_data,
+            latency_ms=int((time.time() - start_time) * 1000),
+            cache_hit=False,
+        )
 
-        # Step 3: Vector search
+    async def _run_pipeline(
+        self,
+        query: str,
+        tenant_id: str,
+        top_k: int,
+        strategy: str,
+        use_query_understanding: bool,
+        cache_key: Optional[str],
+    ) -> dict:
+        """
+        Query understanding, vector search and strategy processing.
+
+        Returns the result fields (without timing). Stores a compact entry
+        under cache_key, if given.
+        """
         # Get extra candidates for validation/reranking buffer
         candidates_multiplier = settings.RETRIEVAL_CANDIDATES_MULTIPLIER if strategy != "fast" else 1
         search_top_k = top_k * candidates_multiplier
 
-        raw_results = vector_service.search(
-            query=embedding_query,
-            tenant_id=tenant_id,
-            top_k=search_top_k,
-        )
+        # Steps 2-3: Query understanding and vector search
+        constraints_dict = None
+        qs_constraints = None
+
+        if use_query_understanding:
+            query_result, raw_results = await self._understand_and_search(query, tenant_id, search_top_k)
+            constraints_dict = query_result.constraints.to_dict()
+            qs_constraints = query_result.constraints
+        else:
+            raw_results = await vector_service.search(
+                query=query,
+                tenant_id=tenant_id,
+                top_k=search_top_k,
+            )
 
         # Step 4: Apply strategy-specific processing
         validation_summary = None
 
         if strategy == "fast":
             # Fast strategy: just return vector search results
-            # Apply basic price filter if constraints present
-            if qs_constraints and (qs_constraints.budget_max or qs_constraints.budget_min):
-                filtered = []
-                for r in raw_results:
-                    price = r.get("price", 0)
-                    if qs_constraints.budget_max and price > qs_constraints.budget_max:
-                        continue
-                    if qs_constraints.budget_min and price < qs_constraints.budget_min:
-                        continue
-                    filtered.append(r)
-                raw_results = filtered
-
+            # (price constraints were already applied by the Qdrant filter)
             final_results = raw_results[:top_k]
 
         elif strategy == "validated":
@@ -174,6 +249,8 @@ class EnhancedRetriever:
                     raw_results,
                     validator_constraints,
                     use_llm=settings.VALIDATION_ENABLED,
+                    scope=await vector_service.get_catalog_namespace(tenant_id),
+                    attributes=await self._candidate_attributes(tenant_id, raw_results),
                 )
                 final_results = validated_results[:top_k]
                 validation_summary = val_summary.model_dump()
@@ -188,6 +265,8 @@ class EnhancedRetriever:
                     raw_results,
                     validator_constraints,
                     use_llm=settings.VALIDATION_ENABLED,
+                    scope=await vector_service.get_catalog_namespace(tenant_id),
+                    attributes=await self._candidate_attributes(tenant_id, raw_results),
                 )
                 validation_summary = val_summary.model_dump()
             else:
@@ -208,27 +287,162 @@ class EnhancedRetriever:
             logger.warning(f"Unknown strategy: {strategy}, falling back to fast")
             final_results = raw_results[:top_k]
 
-        latency_ms = int((time.time() - start_time) * 1000)
-
         result_data = {
             "results": final_results,
             "count": len(final_results),
             "query_understanding": constraints_dict,
             "validation_summary": validation_summary,
             "strategy_used": strategy,
-            "latency_ms": latency_ms,
-            "cache_hit": False,
         }
 
-        # Step 5: Cache the result
-        if use_cache and settings.CACHE_ENABLED:
+        # Step 5: Cache the result (product IDs and scores only; see _hydrate)
+        if cache_key:
             await search_cache.set(
                 cache_key,
-                result_data,
+                self._cache_entry(result_data),
                 settings.CACHE_TTL_SEARCH,
+                settings.CACHE_STALE_TTL_SEARCH,
+            )
+
+        return result_data
+
+    async def _understand_and_search(
+        self,
+        query: str,
+        tenant_id: str,
+        search_top_k: int,
+    ) -> tuple[QueryResult, list[dict]]:
+        """
+        Parse the query and run the vector search for its constraints.
+
+        With RETRIEVAL_SPECULATIVE_SEARCH, the raw query is searched (with the
+        rule parser's price/brand filters) while understanding runs. If the
+        parsed intent matches the query and the filters agree, those results
+        are used; otherwise they are discarded and the search reruns (the
+        query embedding is usually cached by then).
+        """
+        if not settings.RETRIEVAL_SPECULATIVE_SEARCH:
+            query_result = await query_service.understand_async(query)
+            raw_results = await vector_service.search(
+                query=query_result.embedding_query,
+                tenant_id=tenant_id,
+                top_k=search_top_k,
+                # Price/brand constraints run inside the vector search
+                filters=query_result.constraints.to_qdrant_filters(),
             )
+            return query_result, raw_results
 
-        return RetrievalResult(**result_data)
+        guessed_filters = query_service.guess(query).to_qdrant_filters()
+        speculative = asyncio.create_task(vector_service.search(
+            query=query,
+            tenant_id=tenant_id,
+            top_k=search_top_k,
+            filters=guessed_filters,
+        ))
+        try:
+            query_result = await query_service.understand_async(query)
+        except BaseException:
+            self._discard(speculative)
+            raise
+
+        filters = query_result.constraints.to_qdrant_filters()
+        if filters == guessed_filters and self._same_intent(query, query_result.embedding_query):
+            self.speculation_hits += 1
+            return query_result, await speculative
+
+        self.speculation_misses += 1
+        self._discard(speculative)
+        raw_results = await vector_service.search(
+            query=query_result.embedding_query,
+            tenant_id=tenant_id,
+            top_k=search_top_k,
+            filters=filters,
+        )
+        return query_result, raw_results
+
+    async def _candidate_attributes(self, tenant_id: str, results: list[dict]) -> Optional[dict]:
+        """
+        Confident extracted attributes of search candidates, for validation
+        without the LLM. None if disabled.
+
+        Read from the search hits' payloads; only points written before
+        attributes were stored there are looked up in product_attributes.
+        """
+        if not settings.VALIDATION_ATTRIBUTES_ENABLED:
+            return None
+
+        attributes = {
+            r["product_id"]: r["attributes"] for r in results if r.get("attributes") is not None
+        }
+        missing = [r["product_id"] for r in results if r.get("attributes") is None]
+        if missing and db_service.client:
+            try:
+                attributes.update(await db_service.get_attributes_for_products_async(
+                    tenant_id,
+                    missing,
+                    min_confidence=settings.VALIDATION_ATTRIBUTE_MIN_CONFIDENCE,
+                ))
+            except Exception as e:
+                logger.warning(f"Attribute lookup failed, validating with LLM only: {e}")
+        return attributes
+
+    def _same_intent(self, query: str, search_intent: str) -> bool:
+        """Whether search_intent is (nearly) the query itself."""
+        a = " ".join(query.lower().split())
+        b = " ".join(search_intent.lower().split())
+        return a == b or difflib.SequenceMatcher(None, a, b).ratio() >= SPECULATION_MIN_SIMILARITY
+
+    def _discard(self, task: asyncio.Task) -> None:
+        """
+        Let an unneeded speculative search finish in the background.
+
+        It is not cancelled: concurrent requests may be sharing its embedding
+        call through single-flight.
+        """
+        self._discarded.add(task)
+
+        def done(t: asyncio.Task) -> None:
+            self._discarded.discard(t)
+            if not t.cancelled() and t.exception():
+                logger.debug(f"Discarded speculative search failed: {t.exception()}")
+
+        task.add_done_callback(done)
+
+    def speculation_stats(self) -> dict:
+        """Get speculative search statistics."""
+        total = self.speculation_hits + self.speculation_misses
+        return {
+            "enabled": settings.RETRIEVAL_SPECULATIVE_SEARCH,
+            "hits": self.speculation_hits,
+            "misses": self.speculation_misses,
+            "hit_rate": self.speculation_hits / total if total else 0,
+            "discarded_in_flight": len(self._discarded),
+        }
+
+    def _cache_entry(self, result_data: dict) -> dict:
+        """Compact cache entry for a pipeline result."""
+        return {
+            "hits": [(r["product_id"], r["score"]) for r in result_data["results"]],
+            "query_understanding": result_data["query_understanding"],
+            "validation_summary": result_data["validation_summary"],
+            "strategy_used": result_data["strategy_used"],
+        }
+
+    async def _refresh_entry(
+        self,
+        flight_key: str,
+        query: str,
+        tenant_id: str,
+        top_k: int,
+        strategy: str,
+        use_query_understanding: bool,
+    ) -> dict:
+        """Recompute a stale cache entry (search_cache stores the return value)."""
+        result_data = await self.flights.do(
+            flight_key,
+            lambda: self._run_pipeline(query, tenant_id, top_k, strategy, use_query_understanding, None),
+        )
+        return self._cache_entry(result_data)
 
 
 # Singleton instance
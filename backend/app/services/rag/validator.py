@@ -4,19 +4,31 @@ LLM validates that search results match user constraints.
 
 The validator ensures that:
 1. Price constraints are strictly enforced (hard filter)
-2. Semantic constraints (color, style, occasion) are validated by LLM
+2. Semantic constraints (color, style, occasion) are validated by LLM,
+   unless the product's extracted attributes already decide them
 """
 
+import re
 import json
+import hashlib
 import logging
 from typing import Optional
 from pydantic import BaseModel
 from openai import AsyncOpenAI
 from app.core.config import settings
+from app.core.cache import verdict_cache
+from app.services.attributes import normalize_attribute_value
 
 logger = logging.getLogger(__name__)
 
 
+# Constraints checked against extracted product attributes. For closed
+# vocabularies a confident, different value contradicts the constraint; for
+# style and occasion only an equal value decides (a different one may still fit)
+CLOSED_ATTRIBUTES = ["color", "material", "gender"]
+OPEN_ATTRIBUTES = ["style", "occasion"]
+
+
 class ValidationSummary(BaseModel):
     """Summary of validation results."""
     total_candidates: int
@@ -51,6 +63,15 @@ class QueryConstraints(BaseModel):
         """Check if there are price constraints."""
         return self.budget_min is not None or self.budget_max is not None
 
+    def semantic_key(self) -> str:
+        """Normalized constraints the LLM validates (order- and case-insensitive)."""
+        fields = ["category", "color", "gender", "material", "occasion", "style"]
+        return "|".join(
+            f"{field}={' '.join(str(getattr(self, field)).lower().split())}"
+            for field in fields
+            if getattr(self, field)
+        )
+
 
 VALIDATION_PROMPT = """You are a product validation assistant. Your job is to verify if products match the user's requirements.
 
@@ -86,6 +107,9 @@ class ResultValidator:
     Validation types:
     - Hard filters: Price (budget_min/max) - enforced strictly without LLM
     - Soft filters: Color, style, occasion - validated by LLM for semantic match
+
+    Verdicts are cached per (catalog scope, product text, constraints), so
+    only products never judged against these constraints go to the LLM.
     """
 
     def __init__(self):
@@ -144,11 +168,111 @@ class ResultValidator:
             )
         return "\n\n".join(formatted)
 
+    def _verdict_key(self, scope: str, product: dict, constraints_key: str) -> str:
+        """Verdict cache key; covers exactly the product text the LLM sees."""
+        product_text = self._format_products_for_prompt([product])
+        key_data = f"{scope}:{product.get('product_id')}:{product_text}:{constraints_key}"
+        return f"verdict:{hashlib.sha256(key_data.encode()).hexdigest()[:32]}"
+
+    def _attribute_verdict(
+        self,
+        product: dict,
+        attributes: dict[str, dict],
+        constraints: QueryConstraints,
+    ) -> Optional[dict]:
+        """
+        Decide a product from its extracted attributes, without the LLM.
+
+        Returns a verdict when a confident attribute clearly contradicts a
+        constraint (and the product text doesn't mention the wanted value), or
+        when every constraint is clearly matched. Returns None if ambiguous.
+        """
+        product_id = product.get("product_id")
+        text = " ".join([
+            product.get("name") or "",
+            product.get("description") or "",
+            " ".join(product.get("categories") or []),
+        ]).lower()
+
+        ambiguous = False
+        matched = []
+
+        if constraints.category:
+            category = normalize_attribute_value("category", constraints.category)
+            names = " ".join([product.get("name") or "", " ".join(product.get("categories") or [])]).lower()
+            if category and re.search(rf"\b{re.escape(category)}(e?s)?\b", names):
+                matched.append(f"category={category}")
+            else:
+                ambiguous = True
+
+        for field in CLOSED_ATTRIBUTES + OPEN_ATTRIBUTES:
+            wanted = getattr(constraints, field)
+            if not wanted:
+                continue
+            wanted = normalize_attribute_value(field, wanted)
+
+            attribute = attributes.get(field)
+            if not attribute or attribute["confidence"] < settings.VALIDATION_ATTRIBUTE_MIN_CONFIDENCE:
+                ambiguous = True
+                continue
+
+            value = normalize_attribute_value(field, attribute["value"])
+            if wanted is None or value is None:
+                # Outside the vocabulary (or naming several terms): let the LLM judge
+                ambiguous = True
+            elif value == wanted or (field == "gender" and value == "unisex" and wanted in ("men", "women")):
+                matched.append(f"{field}={value}")
+            elif field in CLOSED_ATTRIBUTES and not re.search(rf"\b{re.escape(wanted)}\b", text):
+                return {
+                    "product_id": product_id,
+                    "matches": False,
+                    "reason": f"{field} is {value}, not {wanted}",
+                    "source": "attributes",
+                }
+            else:
+                ambiguous = True
+
+        if ambiguous:
+            return None
+        return {
+            "product_id": product_id,
+            "matches": True,
+            "reason": f"Attributes match: {', '.join(matched)}",
+            "source": "attributes",
+        }
+
+    async def _llm_verdicts(self, products: list[dict], constraints: QueryConstraints) -> list[dict]:
+        """Ask the LLM whether each product matches; returns its verdict list."""
+        prompt = VALIDATION_PROMPT.format(
+            constraints=self._format_constraints_for_prompt(constraints),
+            products=self._format_products_for_prompt(products),
+        )
+
+        response = await self.openai.chat.completions.create(
+            model=settings.CHAT_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0,
+            max_tokens=1000,
+        )
+
+        response_text = response.choices[0].message.content.strip()
+
+        # Parse JSON response
+        # Handle potential markdown code blocks
+        if response_text.startswith("```"):
+            response_text = response_text.split("```")[1]
+            if response_text.startswith("json"):
+                response_text = response_text[4:]
+
+        return json.loads(response_text)
+
     async def validate(
         self,
         results: list[dict],
         constraints: QueryConstraints,
         use_llm: bool = True,
+        scope: Optional[str] = None,
+        attributes: Optional[dict[str, dict[str, dict]]] = None,
     ) -> tuple[list[dict], ValidationSummary]:
         """
         Validate search results against user constraints.
@@ -157,6 +281,10 @@ class ResultValidator:
             results: List of product dictionaries from search
             constraints: Extracted query constraints
             use_llm: Whether to use LLM for semantic validation
+            scope: Catalog the products belong to (e.g. the tenant's catalog
+                namespace); enables the verdict cache
+            attributes: Extracted attributes by product_id
+                ({name: {"value", "confidence"}}) for deterministic verdicts
 
         Returns:
             Tuple of (validated_results, validation_summary)
@@ -184,33 +312,53 @@ class ResultValidator:
                 validation_details=[{"type": "no_results_after_price_filter"}],
             )
 
-        try:
-            prompt = VALIDATION_PROMPT.format(
-                constraints=self._format_constraints_for_prompt(constraints),
-                products=self._format_products_for_prompt(price_filtered),
-            )
-
-            response = await self.openai.chat.completions.create(
-                model=settings.CHAT_MODEL,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0,
-                max_tokens=1000,
-            )
-
-            response_text = response.choices[0].message.content.strip()
+        # Known verdicts come from attributes or the cache; only the rest go to the LLM
+        verdicts: dict[str, dict] = {}
+        if attributes:
+            for p in price_filtered:
+                product_id = str(p.get("product_id"))
+                verdict = self._attribute_verdict(p, attributes.get(product_id, {}), constraints)
+                if verdict:
+                    verdicts[product_id] = verdict
+
+        verdict_keys: dict[str, str] = {}
+        if scope is not None:
+            constraints_key = constraints.semantic_key()
+            for p in price_filtered:
+                product_id = str(p.get("product_id"))
+                if product_id in verdicts:
+                    continue
+                verdict_keys[product_id] = self._verdict_key(scope, p, constraints_key)
+                cached = await verdict_cache.get(verdict_keys[product_id])
+                if cached is not None:
+                    verdicts[product_id] = {**cached, "cached": True}
+        unknown = [p for p in price_filtered if str(p.get("product_id")) not in verdicts]
 
-            # Parse JSON response
-            # Handle potential markdown code blocks
-            if response_text.startswith("```"):
-                response_text = response_text.split("```")[1]
-                if response_text.startswith("json"):
-                    response_text = response_text[4:]
-
-            validations = json.loads(response_text)
+        try:
+            validations = await self._llm_verdicts(unknown, constraints) if unknown else []
+
+            unknown_ids = {str(p.get("product_id")) for p in unknown}
+            for v in validations:
+                product_id = str(v.get("product_id"))
+                if product_id not in unknown_ids:
+                    continue
+                verdicts[product_id] = v
+                if product_id in verdict_keys:
+                    await verdict_cache.set(
+                        verdict_keys[product_id],
+                        {"product_id": v["product_id"], "matches": bool(v.get("matches")), "reason": v.get("reason", "")},
+                        settings.CACHE_TTL_VERDICT,
+                    )
 
             # Filter to only products that passed validation
-            passed_ids = {v["product_id"] for v in validations if v.get("matches")}
-            validated_results = [p for p in price_filtered if p.get("product_id") in passed_ids]
+            validated_results = [
+                p for p in price_filtered
+                if verdicts.get(str(p.get("product_id")), {}).get("matches")
+            ]
+            validations = [
+                verdicts[str(p.get("product_id"))] for p in price_filtered
+                if str(p.get("product_id")) in verdicts
+            ]
 
             return validated_results, ValidationSummary(
                 total_candidates=total_candidates,
@@ -221,11 +369,15 @@ class ResultValidator:
 
         except Exception as e:
             logger.error(f"LLM validation failed: {e}")
-            # On error, return price-filtered results without semantic validation
-            return price_filtered, ValidationSummary(
+            # On error, cached verdicts still apply; the rest pass on price only
+            fallback = [
+                p for p in price_filtered
+                if verdicts.get(str(p.get("product_id")), {"matches": True}).get("matches")
+            ]
+            return fallback, ValidationSummary(
                 total_candidates=total_candidates,
-                passed_validation=len(price_filtered),
-                failed_validation=total_candidates - len(price_filtered),
+                passed_validation=len(fallback),
+                failed_validation=total_candidates - len(fallback),
                 validation_details=[{"error": str(e), "fallback": "price_filter_only"}],
             )
 
@@ -0,0 +1,86 @@
+"""
+Sparse Encoder
+Lexical sparse vectors (BM25-style) for hybrid dense + sparse search.
+
+Text is split into lowercase word tokens; codes such as SKUs ("PB-1234",
+"7710/420") are kept whole as well as split into parts. Each token is hashed
+to a stable index, so no vocabulary has to be stored or shared between
+processes. Document weights use BM25 term-frequency saturation; IDF is
+applied by Qdrant (Modifier.IDF) from the collection's own statistics.
+
+Encoding is pure Python - the sparse leg of a search needs no API call.
+"""
+
+import re
+import zlib
+from collections import Counter
+
+from qdrant_client.models import SparseVector
+
+# Bump when tokenization or weighting changes: stored vectors must be rebuilt
+SPARSE_ENCODER_VERSION = 1
+
+# Word characters, optionally joined into codes by - _ . /
+TOKEN_PATTERN = re.compile(r"[^\W_]+(?:[-_./][^\W_]+)*")
+CODE_SEPARATORS = re.compile(r"[-_./]")
+
+# BM25 parameters; documents are embedding texts (~60 tokens on average)
+BM25_K1 = 1.2
+BM25_B = 0.75
+AVG_DOC_TOKENS = 60
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has",
+    "in", "is", "it", "of", "on", "or", "that", "the", "to", "with",
+    "i", "me", "my", "we", "you", "your", "want", "need", "looking",
+    "some", "any", "show", "find", "get",
+}
+
+
+class SparseEncoder:
+    """
+    Hashed-token sparse encoder.
+
+    Usage:
+        vector = sparse_encoder.encode_document(product_text)
+        query_vector = sparse_encoder.encode_query("black denim jacket")
+    """
+
+    def tokenize(self, text: str) -> list[str]:
+        """Lowercase tokens, with codes kept both whole and split."""
+        tokens = []
+        for match in TOKEN_PATTERN.findall((text or "").lower()):
+            parts = [p for p in CODE_SEPARATORS.split(match) if p]
+            if len(parts) > 1:
+                tokens.append(match)
+            tokens.extend(p for p in parts if p not in STOPWORDS)
+        return tokens
+
+    def _index(self, token: str) -> int:
+        """Stable uint32 index for a token."""
+        return zlib.crc32(token.encode("utf-8"))
+
+    def _to_sparse(self, weights: dict[int, float]) -> SparseVector:
+        """Build a SparseVector with sorted indices."""
+        indices = sorted(weights)
+        return SparseVector(indices=indices, values=[weights[i] for i in indices])
+
+    def encode_document(self, text: str) -> SparseVector:
+        """Encode product text with BM25 term-frequency weights."""
+        tokens = self.tokenize(text)
+        length_norm = 1 - BM25_B + BM25_B * len(tokens) / AVG_DOC_TOKENS
+
+        weights: dict[int, float] = {}
+        for token, tf in Counter(tokens).items():
+            index = self._index(token)
+            # Hash collisions are rare; summing keeps the encoding deterministic
+            weights[index] = weights.get(index, 0.0) + tf * (BM25_K1 + 1) / (tf + BM25_K1 * length_norm)
+        return self._to_sparse(weights)
+
+    def encode_query(self, text: str) -> SparseVector:
+        """Encode a query: each distinct token once, weight 1 (IDF comes from Qdrant)."""
+        return self._to_sparse({self._index(token): 1.0 for token in set(self.tokenize(text))})
+
+
+# Singleton instance
+sparse_encoder = SparseEncoder()
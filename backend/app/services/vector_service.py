@@ -4,8 +4,17 @@ Handles embeddings and Qdrant vector database operations.
 Zero-hallucination RAG with tenant isolation.
 """
 
-from openai import OpenAI
-from qdrant_client import QdrantClient
+import json
+import math
+import time
+import uuid
+import asyncio
+import hashlib
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from qdrant_client.http.exceptions import UnexpectedResponse
 from qdrant_client.models import (
     Distance,
     VectorParams,
@@ -13,18 +22,153 @@ from qdrant_client.models import (
     Filter,
     FieldCondition,
     MatchValue,
+    MatchAny,
     PayloadSchemaType,
+    KeywordIndexParams,
+    KeywordIndexType,
+    ShardingMethod,
+    PointIdsList,
+    SetPayload,
+    SetPayloadOperation,
+    QueryRequest,
+    Prefetch,
+    FusionQuery,
+    Fusion,
+    SparseVectorParams,
+    Modifier,
+    SearchParams,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    TextIndexParams,
+    TextIndexType,
+    TokenizerType,
 )
-from typing import Optional
+from typing import Optional, Union
 from app.core.config import settings
+from app.core.cache import embedding_cache, SingleFlight
+from app.services.embedding_store import create_embedding_store
+from app.services.embedding_providers import create_embedding_provider
+from app.services.sparse_encoder import sparse_encoder, SPARSE_ENCODER_VERSION
+from app.services.hot_replica import HotReplicaCache, TenantReplica
+from app.services.product_store import product_store
+from app.services.attributes import normalize_attribute_value
+
+logger = logging.getLogger(__name__)
+
+# Namespace for deterministic point IDs - never change, or every point gets a new ID
+POINT_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "sift-retail-ai/products")
+
+# Qdrant request sizes for retrieve/scroll/delete by ID
+POINT_PAGE_SIZE = 1000
+
+# Matches no catalog namespace (tenant IDs can't contain "@"); see _write_barrier
+WRITE_BARRIER_NAMESPACE = "@barrier"
+
+# Extracted attributes stored as keyword payload fields (confident, normalized
+# values only): closed ones (color, material, gender) filter inside the vector
+# search, all of them let validation skip the LLM
+ATTRIBUTE_PAYLOAD_FIELDS = (
+    "color", "material", "gender", "style", "occasion", "fit", "pattern", "season",
+)
+
+# Payload fields returned with search hits (see _product_record)
+RESULT_PAYLOAD_FIELDS = [
+    "product_id", "name", "price", "description", "image_url",
+    "permalink", "categories", "stock_status",
+    *ATTRIBUTE_PAYLOAD_FIELDS, "attribute_confidence",
+]
+
+# Payload fields that update_payload may change without re-embedding
+PAYLOAD_UPDATE_FIELDS = ("price", "stock_status")
+
+# Dense embeddings are the unnamed vector; lexical sparse vectors are named
+DENSE_VECTOR_NAME = ""
+SPARSE_VECTOR_NAME = "text"
+SPARSE_VECTORS_CONFIG = {SPARSE_VECTOR_NAME: SparseVectorParams(modifier=Modifier.IDF)}
+
+# Payload indexes so filters run inside the HNSW search instead of in Python
+PAYLOAD_INDEXES = {
+    # is_tenant: Qdrant co-locates each tenant's points on disk for filtered search
+    "tenant_id": KeywordIndexParams(type=KeywordIndexType.KEYWORD, is_tenant=True),
+    "price": PayloadSchemaType.FLOAT,
+    "categories": PayloadSchemaType.KEYWORD,
+    "brand": PayloadSchemaType.KEYWORD,
+    "stock_status": PayloadSchemaType.KEYWORD,
+    **{field: PayloadSchemaType.KEYWORD for field in ATTRIBUTE_PAYLOAD_FIELDS},
+    # Full-text on name: brand constraints also match products without a brand field
+    "name": TextIndexParams(
+        type=TextIndexType.TEXT,
+        tokenizer=TokenizerType.WORD,
+        lowercase=True,
+    ),
+    # Full-text on description: attribute filters keep products that mention the value
+    "description": TextIndexParams(
+        type=TextIndexType.TEXT,
+        tokenizer=TokenizerType.WORD,
+        lowercase=True,
+    ),
+}
+
+
+def dense_vector_of(vector) -> Optional[list[float]]:
+    """The dense part of a point's vector (plain list, or dict of named vectors)."""
+    if isinstance(vector, dict):
+        return vector.get(DENSE_VECTOR_NAME)
+    return vector
+
+
+def shorten_embedding(vector: list[float], dimensions: int) -> list[float]:
+    """
+    Shorten a text-embedding-3 vector to `dimensions` (truncate + L2-normalize).
+
+    Matches what the API returns when the `dimensions` parameter is set, so
+    existing vectors can be migrated without re-embedding.
+    """
+    head = vector[:dimensions]
+    norm = math.sqrt(sum(x * x for x in head)) or 1.0
+    return [x / norm for x in head]
+
+
+def quantization_config(
+    mode: str = None,
+) -> Optional[Union[ScalarQuantization, BinaryQuantization]]:
+    """Qdrant quantization config for a QDRANT_QUANTIZATION mode."""
+    mode = mode or settings.QDRANT_QUANTIZATION
+    if mode == "scalar":
+        return ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    if mode == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    return None
+
+
+def search_params(mode: str = None) -> Optional[SearchParams]:
+    """Search params that oversample and rescore when quantization is enabled."""
+    mode = mode or settings.QDRANT_QUANTIZATION
+    if mode == "none":
+        return None
+    return SearchParams(
+        quantization=QuantizationSearchParams(
+            rescore=settings.QDRANT_QUANTIZATION_RESCORE,
+            oversampling=settings.QDRANT_QUANTIZATION_OVERSAMPLING,
+        )
+    )
 
 
 class VectorService:
     def __init__(self):
-        # OpenAI client for embeddings
-        self.openai = OpenAI(api_key=settings.OPENAI_API_KEY)
+        # Embedding backend (OpenAI by default; EMBEDDING_PROVIDER=hashing runs offline)
+        self.embedder = create_embedding_provider()
 
-        # Qdrant client - use cloud if configured, otherwise in-memory
+        # Persistent store so unchanged product texts are never re-embedded
+        self.embedding_store = create_embedding_store(self.embedder.model)
+
+        # Qdrant client - use cloud if configured, otherwise local storage
         qdrant_configured = (
             settings.QDRANT_URL
             and settings.QDRANT_API_KEY
@@ -37,162 +181,1492 @@ class VectorService:
                 url=settings.QDRANT_URL,
                 api_key=settings.QDRANT_API_KEY,
             )
+            # Non-blocking client for the request path
+            self.async_qdrant = AsyncQdrantClient(
+                url=settings.QDRANT_URL,
+                api_key=settings.QDRANT_API_KEY,
+            )
             print("📦 Qdrant: Connected to cloud instance")
-        else:
-            # Local Qdrant for development
+        elif settings.QDRANT_LOCAL_PATH == ":memory:":
+            # Local Qdrant for development. An async client would get its own
+            # separate storage, so request-path calls run the sync client in a thread.
             self.qdrant = QdrantClient(":memory:")
+            self.async_qdrant = None
             print("📦 Qdrant: Using in-memory storage (data won't persist)")
+        else:
+            # Embedded on-disk Qdrant: the index survives restarts, so nothing is
+            # re-embedded. Same threading caveat as above (one client per storage).
+            self.qdrant = QdrantClient(path=settings.QDRANT_LOCAL_PATH)
+            self.async_qdrant = None
+            print(f"📦 Qdrant: Using local storage at {settings.QDRANT_LOCAL_PATH}")
+
+        # Coalesces concurrent embedding requests for the same query
+        self.query_flights = SingleFlight("query_embeddings")
+
+        # Tenancy mode (see TENANCY below); custom sharding needs a Qdrant server
+        self.tenancy = settings.QDRANT_TENANCY
+        if self.tenancy == "shard_key" and not qdrant_configured:
+            print("⚠️  QDRANT_TENANCY=shard_key needs a Qdrant server; using shared tenancy")
+            self.tenancy = "shared"
+        self._ready_tenants: set[str] = set()
+        # Collection name -> whether it has the sparse vector (older collections don't)
+        self._sparse_support: dict[str, bool] = {}
 
         self.collection_name = settings.QDRANT_COLLECTION
+        # Per-tenant active catalog version (see CATALOG VERSIONS below)
+        self.catalog_versions_collection = f"{self.collection_name}_catalog_versions"
+        self._active_versions: dict[str, tuple[dict, float]] = {}
+        # In-process copies of small tenants' catalogs (see HOT REPLICAS below)
+        self.hot_replicas = HotReplicaCache() if settings.HOT_REPLICA_ENABLED else None
+        self._replica_loads: set[asyncio.Task] = set()
         self._ensure_collection()
 
     def _ensure_collection(self):
-        """Create collection if it doesn't exist."""
-        collections = self.qdrant.get_collections().collections
-        exists = any(c.name == self.collection_name for c in collections)
+        """Create the shared product collection (unless per-tenant) and the catalog versions collection."""
+        if self.tenancy != "collection":
+            self._create_collection(self.collection_name)
+
+            sharding = self.qdrant.get_collection(self.collection_name).config.params.sharding_method
+            if self.tenancy == "shard_key" and sharding != ShardingMethod.CUSTOM:
+                print("⚠️  Collection is not custom-sharded; run scripts/migrate_tenancy.py. Using shared tenancy")
+                self.tenancy = "shared"
 
-        if not exists:
+        # Vectorless collection holding one catalog version record per tenant
+        if not self.qdrant.collection_exists(self.catalog_versions_collection):
             self.qdrant.create_collection(
-                collection_name=self.collection_name,
+                collection_name=self.catalog_versions_collection,
+                vectors_config={},
+            )
+
+    def _create_collection(self, name: str) -> None:
+        """Create a product collection if it doesn't exist, and any missing payload indexes."""
+        # collection_exists also resolves aliases (set by scripts/migrate_collection.py)
+        if not self.qdrant.collection_exists(name):
+            self.qdrant.create_collection(
+                collection_name=name,
                 vectors_config=VectorParams(
                     size=settings.EMBEDDING_DIMENSIONS,
                     distance=Distance.COSINE,
                 ),
+                sparse_vectors_config=SPARSE_VECTORS_CONFIG,
+                quantization_config=quantization_config(),
+                sharding_method=ShardingMethod.CUSTOM if self.tenancy == "shard_key" else None,
             )
-            # Create payload index for tenant_id filtering
+            print(f"📦 Created collection {name} (quantization: {settings.QDRANT_QUANTIZATION})")
+        else:
+            size = self.qdrant.get_collection(name).config.params.vectors.size
+            if size != settings.EMBEDDING_DIMENSIONS:
+                print(
+                    f"⚠️  Collection {name} has {size}-dim vectors but EMBEDDING_DIMENSIONS="
+                    f"{settings.EMBEDDING_DIMENSIONS}; run scripts/migrate_collection.py"
+                )
+            if not self._supports_sparse(name):
+                print(f"⚠️  Collection {name} has no sparse vectors (dense-only search); run scripts/migrate_collection.py")
+
+        self._ensure_payload_indexes(name)
+
+    def _supports_sparse(self, name: str) -> bool:
+        """Whether a collection has the sparse vector (cached per collection)."""
+        if name not in self._sparse_support:
+            sparse_vectors = self.qdrant.get_collection(name).config.params.sparse_vectors or {}
+            self._sparse_support[name] = SPARSE_VECTOR_NAME in sparse_vectors
+        return self._sparse_support[name]
+
+    def _ensure_payload_indexes(self, name: str) -> None:
+        """Create payload indexes missing from a collection (migrates older collections)."""
+        payload_schema = self.qdrant.get_collection(name).payload_schema or {}
+
+        missing = [field for field in PAYLOAD_INDEXES if field not in payload_schema]
+        for field in missing:
             self.qdrant.create_payload_index(
-                collection_name=self.collection_name,
-                field_name="tenant_id",
-                field_schema=PayloadSchemaType.KEYWORD,
+                collection_name=name,
+                field_name=field,
+                field_schema=PAYLOAD_INDEXES[field],
             )
-            print("📦 Created collection with tenant_id index")
+
+        if missing:
+            print(f"📦 Created payload indexes: {', '.join(missing)}")
 
     def create_embedding(self, text: str) -> list[float]:
         """
-        Convert text into a 1536-dimensional vector.
+        Convert text into an EMBEDDING_DIMENSIONS-dimensional vector (1536 by default).
         This captures the semantic 'meaning' of the text.
         """
-        response = self.openai.embeddings.create(
-            model=settings.EMBEDDING_MODEL,
-            input=text,
+        return self._embed_batch([text])[0]
+
+    def create_embeddings(self, texts: list[str]) -> list[Optional[list[float]]]:
+        """
+        Embed many texts, reusing stored vectors where possible.
+
+        Texts already in the embedding store are served from it; the remaining
+        unique texts are embedded with batched provider requests and written back.
+        The returned list is aligned with `texts`; an entry is None when that
+        input could not be embedded (empty text or API error).
+        """
+        vectors: list[Optional[list[float]]] = [None] * len(texts)
+        pending = [i for i, text in enumerate(texts) if text and text.strip()]
+
+        if self.embedding_store and pending:
+            stored = self.embedding_store.get_many([texts[i] for i in pending])
+            for i, vector in zip(pending, stored):
+                vectors[i] = vector
+            pending = [i for i in pending if vectors[i] is None]
+
+        if not pending:
+            return vectors
+
+        # Identical texts (e.g. product variants) are embedded once
+        unique_texts = list(dict.fromkeys(texts[i] for i in pending))
+        embedded = dict(zip(unique_texts, self._embed_texts(unique_texts)))
+
+        if self.embedding_store:
+            self.embedding_store.put_many(unique_texts, [embedded[t] for t in unique_texts])
+
+        for i in pending:
+            vectors[i] = embedded[texts[i]]
+
+        return vectors
+
+    def _embed_texts(self, texts: list[str]) -> list[Optional[list[float]]]:
+        """
+        Embed texts with batched, concurrent provider requests.
+
+        Inputs are grouped into requests bounded by EMBEDDING_BATCH_MAX_INPUTS
+        and EMBEDDING_BATCH_MAX_TOKENS, and up to EMBEDDING_CONCURRENCY requests
+        run at once. Failed inputs come back as None.
+        """
+        vectors: list[Optional[list[float]]] = [None] * len(texts)
+        batches = self._make_embedding_batches(texts)
+        if not batches:
+            return vectors
+
+        workers = max(1, min(settings.EMBEDDING_CONCURRENCY, len(batches)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(self._embed_batch_safe, [texts[i] for i in batch]): batch
+                for batch in batches
+            }
+            for future in as_completed(futures):
+                for i, vector in zip(futures[future], future.result()):
+                    vectors[i] = vector
+
+        return vectors
+
+    async def create_embedding_async(self, text: str) -> list[float]:
+        """Non-blocking create_embedding for use on the request path."""
+        return (await self._embed_batch_async([text]))[0]
+
+    async def _embed_batch_async(self, texts: list[str]) -> list[list[float]]:
+        """Embed a batch of texts in a single non-blocking provider request."""
+        return await self.embedder.embed_async(texts)
+
+    async def _qdrant_async(self, method: str, **kwargs):
+        """
+        Call a Qdrant client method without blocking the event loop.
+
+        Uses the async client when connected to a server; for local storage the
+        sync client is run in a worker thread.
+        """
+        if self.async_qdrant:
+            return await getattr(self.async_qdrant, method)(**kwargs)
+        return await asyncio.to_thread(getattr(self.qdrant, method), **kwargs)
+
+    def _normalize_query(self, query: str) -> str:
+        """Normalize a query for embedding and cache lookup (case, whitespace)."""
+        return " ".join(query.lower().split())
+
+    def _query_cache_key(self, normalized_query: str) -> str:
+        """Cache key for a query embedding; includes the model so stale vectors never mix."""
+        key_data = f"{self.embedder.model}:{settings.EMBEDDING_DIMENSIONS}:{normalized_query}"
+        return f"qemb:{hashlib.sha256(key_data.encode()).hexdigest()[:32]}"
+
+    async def embed_query(self, query: str) -> list[float]:
+        """
+        Embed a search query with caching.
+
+        Queries are normalized, looked up in embedding_cache, and on a miss
+        embedded once - concurrent identical misses share a single embedding call.
+        """
+        normalized = self._normalize_query(query)
+        if not settings.CACHE_ENABLED:
+            return await self.create_embedding_async(normalized)
+
+        cache_key = self._query_cache_key(normalized)
+        cached_vector = await embedding_cache.get(cache_key)
+        if cached_vector is not None:
+            return cached_vector
+
+        async def compute() -> list[float]:
+            vector = await self.create_embedding_async(normalized)
+            await embedding_cache.set(cache_key, vector, settings.CACHE_TTL_EMBEDDING)
+            return vector
+
+        return await self.query_flights.do(cache_key, compute)
+
+    async def embed_queries(self, queries: list[str]) -> list[list[float]]:
+        """
+        Embed several search queries at once.
+
+        Cached queries are served from embedding_cache; all remaining unique
+        queries are embedded together in one provider request.
+        """
+        normalized = [self._normalize_query(q) for q in queries]
+        vectors: dict[str, list[float]] = {}
+
+        if settings.CACHE_ENABLED:
+            for text in set(normalized):
+                cached_vector = await embedding_cache.get(self._query_cache_key(text))
+                if cached_vector is not None:
+                    vectors[text] = cached_vector
+
+        missing = [text for text in dict.fromkeys(normalized) if text not in vectors]
+        if missing:
+            for text, vector in zip(missing, await self._embed_batch_async(missing)):
+                vectors[text] = vector
+                if settings.CACHE_ENABLED:
+                    await embedding_cache.set(
+                        self._query_cache_key(text), vector, settings.CACHE_TTL_EMBEDDING
+                    )
+
+        return [vectors[text] for text in normalized]
+
+    def _estimate_tokens(self, text: str) -> int:
+        """Rough token count for batch sizing (~4 characters per token)."""
+        return len(text) // 4 + 1
+
+    def _make_embedding_batches(self, texts: list[str]) -> list[list[int]]:
+        """Group non-empty input indices into request-sized batches."""
+        batches: list[list[int]] = []
+        current: list[int] = []
+        current_tokens = 0
+
+        for i, text in enumerate(texts):
+            if not text or not text.strip():
+                continue
+
+            tokens = self._estimate_tokens(text)
+            if current and (
+                len(current) >= settings.EMBEDDING_BATCH_MAX_INPUTS
+                or current_tokens + tokens > settings.EMBEDDING_BATCH_MAX_TOKENS
+            ):
+                batches.append(current)
+                current, current_tokens = [], 0
+
+            current.append(i)
+            current_tokens += tokens
+
+        if current:
+            batches.append(current)
+        return batches
+
+    def _embed_batch(self, texts: list[str]) -> list[list[float]]:
+        """Embed a batch of texts in a single provider request."""
+        return self.embedder.embed(texts)
+
+    def _embed_batch_safe(self, texts: list[str]) -> list[Optional[list[float]]]:
+        """
+        Embed a batch, isolating failures.
+
+        A failed request is split in half and retried, so one bad input
+        only loses its own vector instead of the whole batch.
+        """
+        try:
+            return self._embed_batch(texts)
+        except Exception as e:
+            if len(texts) == 1:
+                logger.warning(f"Embedding failed for input ({len(texts[0])} chars): {e}")
+                return [None]
+
+            mid = len(texts) // 2
+            return self._embed_batch_safe(texts[:mid]) + self._embed_batch_safe(texts[mid:])
+
+    def _point_id(self, namespace: str, product_id: str) -> str:
+        """
+        Stable point ID for a product in a catalog namespace (UUIDv5).
+
+        Identical across processes and restarts, so re-ingesting a product
+        overwrites its point instead of creating a duplicate. For unversioned
+        catalogs the namespace is the tenant_id, matching earlier point IDs.
+        """
+        return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{namespace}_{product_id}"))
+
+    def _build_payload(self, product: dict) -> dict:
+        """Build the Qdrant payload for a product."""
+        try:
+            price = float(product["price"] or 0)
+        except (TypeError, ValueError):
+            price = 0.0
+
+        return {
+            "product_id": product["id"],
+            "tenant_id": product["tenant_id"],
+            "name": product["name"],
+            # Numeric price and normalized brand so both can be filtered in Qdrant
+            "price": price,
+            "brand": (product.get("brand") or "").lower().strip(),
+            "sku": product.get("sku") or "",
+            "description": product["short_description"],
+            "image_url": product["image_url"],
+            "permalink": product["permalink"],
+            "categories": product["categories"],
+            "stock_status": product["stock_status"],
+            **self._attribute_payload(product),
+        }
+
+    def _attribute_payload(self, product: dict) -> dict:
+        """
+        Payload fields for a product's extracted attributes
+        (product["attributes"]: {name: {"value", "confidence"}} or None).
+
+        Confident values of ATTRIBUTE_PAYLOAD_FIELDS become normalized keyword
+        fields (see normalize_attribute_value; values outside a closed
+        vocabulary are dropped); their confidences go in attribute_confidence,
+        which marks the point as carrying attributes (even if none were
+        confident). Products that weren't enriched (None) get no fields.
+        """
+        if product.get("attributes") is None:
+            return {}
+
+        fields = {}
+        confidence = {}
+        for name in ATTRIBUTE_PAYLOAD_FIELDS:
+            attribute = product["attributes"].get(name)
+            if not attribute or attribute["confidence"] < settings.ATTRIBUTE_PAYLOAD_MIN_CONFIDENCE:
+                continue
+            value = normalize_attribute_value(name, attribute["value"])
+            if value is None:
+                continue
+            fields[name] = value
+            confidence[name] = attribute["confidence"]
+        return {**fields, "attribute_confidence": confidence}
+
+    def _sparse_text(self, product: dict) -> str:
+        """Text for the lexical sparse vector: embedding text plus the SKU."""
+        return f"{product['combined_text']} {product.get('sku') or ''}"
+
+    def _content_hash(self, product: dict, sparse: bool = False) -> str:
+        """Hash of everything stored for a product (embedding input, sparse encoding, payload)."""
+        content = json.dumps(
+            {
+                "model": self.embedder.model,
+                "dimensions": settings.EMBEDDING_DIMENSIONS,
+                "text": product["combined_text"],
+                # Points written without (or with an older) sparse vector get rewritten
+                "sparse": SPARSE_ENCODER_VERSION if sparse else None,
+                "payload": self._build_payload(product),
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def _build_point(
+        self,
+        product: dict,
+        embedding: list[float],
+        namespace: str,
+        sparse: bool = False,
+    ) -> PointStruct:
+        """Build a Qdrant point with the product payload, stored under a catalog namespace."""
+        vector = embedding
+        if sparse:
+            vector = {
+                DENSE_VECTOR_NAME: embedding,
+                SPARSE_VECTOR_NAME: sparse_encoder.encode_document(self._sparse_text(product)),
+            }
+
+        return PointStruct(
+            id=self._point_id(namespace, product["id"]),
+            vector=vector,
+            payload={
+                **self._build_payload(product),
+                # Searches filter on the namespace ("tenant" or "tenant@version")
+                "tenant_id": namespace,
+                "content_hash": self._content_hash(product, sparse),
+            },
         )
-        return response.data[0].embedding
 
     def upsert_product(self, product: dict) -> None:
         """
         Store a product in the vector database.
         Uses combined_text for the embedding.
         """
-        # Create embedding from combined product text
-        embedding = self.create_embedding(product["combined_text"])
+        if not self.upsert_products_batch([product]):
+            raise Exception(f"Could not embed product {product['id']}")
 
-        # Create point with payload
-        point = PointStruct(
-            id=hash(f"{product['tenant_id']}_{product['id']}") % (2**63),
-            vector=embedding,
-            payload={
-                "product_id": product["id"],
-                "tenant_id": product["tenant_id"],
-                "name": product["name"],
-                "price": product["price"],
-                "description": product["short_description"],
-                "image_url": product["image_url"],
-                "permalink": product["permalink"],
-                "categories": product["categories"],
-                "stock_status": product["stock_status"],
-            },
+    def upsert_products_batch(
+        self,
+        products: list[dict],
+        only_changed: bool = False,
+        version: Optional[str] = None,
+    ) -> int:
+        """
+        Batch upsert products for efficiency.
+
+        Embeddings are generated with batched requests (see create_embeddings).
+        With only_changed=True, products whose stored content hash matches are
+        not rewritten. Products go into each tenant's active catalog version,
+        or into a staged `version` from begin_catalog_build. Returns the number
+        of products now up to date in the index (written + unchanged); products
+        whose embedding failed are skipped.
+        """
+        namespaces = {
+            tenant_id: self._catalog_namespace(tenant_id, version) if version else self._namespace(tenant_id)
+            for tenant_id in {p["tenant_id"] for p in products}
+        }
+        for tenant_id in namespaces:
+            self._ensure_tenant(tenant_id)
+        existing_hashes = self._get_content_hashes(products, namespaces) if only_changed else {}
+        stats = self._upsert_changed(products, existing_hashes, namespaces)
+        # Staged builds change what searches see only when published
+        if stats["upserted"] and not version:
+            for tenant_id in namespaces:
+                self._bump_revision(tenant_id)
+        return stats["upserted"] + stats["unchanged"]
+
+    def sync_tenant_products(self, tenant_id: str, products: list[dict]) -> dict:
+        """
+        Idempotently make a tenant's points match a full catalog.
+
+        Only new or changed products are embedded and written; points for
+        products no longer in the catalog (and duplicates left by older point
+        ID schemes) are deleted in bulk.
+
+        Returns counts: upserted, unchanged, failed, deleted.
+        """
+        self._ensure_tenant(tenant_id)
+        namespace = self._namespace(tenant_id)
+        existing = self._scroll_tenant_points(namespace)
+        existing_hashes = {
+            point_id: payload.get("content_hash") for point_id, payload in existing.items()
+        }
+
+        stats = self._upsert_changed(products, existing_hashes, {tenant_id: namespace})
+
+        keep_ids = {self._point_id(namespace, p["id"]) for p in products}
+        orphan_ids = [point_id for point_id in existing if point_id not in keep_ids]
+        stats["deleted"] = self._delete_points(tenant_id, orphan_ids)
+        if stats["upserted"] or stats["deleted"]:
+            self._bump_revision(tenant_id)
+
+        return stats
+
+    def _upsert_changed(
+        self,
+        products: list[dict],
+        existing_hashes: dict[str, str],
+        namespaces: dict[str, str],
+    ) -> dict:
+        """
+        Embed and write products whose content hash differs from existing_hashes.
+
+        `namespaces` maps each tenant_id to the catalog namespace to write into.
+        """
+        # Last occurrence wins if a product appears twice in the batch
+        by_point_id = {self._point_id(namespaces[p["tenant_id"]], p["id"]): p for p in products}
+        # Sparse vectors are only written where the collection has them
+        sparse = {
+            tenant_id: self._supports_sparse(self._target(tenant_id)["collection_name"])
+            for tenant_id in namespaces
+        }
+
+        changed = [
+            (point_id, product)
+            for point_id, product in by_point_id.items()
+            if existing_hashes.get(point_id) != self._content_hash(product, sparse[product["tenant_id"]])
+        ]
+        unchanged = len(by_point_id) - len(changed)
+
+        embeddings = self.create_embeddings([p["combined_text"] for _, p in changed])
+
+        points_by_tenant = defaultdict(list)
+        for (_, product), embedding in zip(changed, embeddings):
+            if embedding is None:
+                continue
+            tenant_id = product["tenant_id"]
+            points_by_tenant[tenant_id].append(
+                self._build_point(product, embedding, namespaces[tenant_id], sparse[tenant_id])
+            )
+
+        upserted = sum(len(tenant_points) for tenant_points in points_by_tenant.values())
+        failed = len(changed) - upserted
+        if failed:
+            logger.warning(f"Skipped {failed} products without embeddings")
+
+        for tenant_id, tenant_points in points_by_tenant.items():
+            self._upload_points(tenant_id, namespaces[tenant_id], tenant_points)
+
+        return {"upserted": upserted, "unchanged": unchanged, "failed": failed}
+
+    def _upload_points(self, tenant_id: str, namespace: str, points: list[PointStruct]) -> None:
+        """
+        Upsert a tenant's points in chunks, several requests in flight at once.
+
+        Chunks are bounded by QDRANT_UPSERT_BATCH_POINTS and an estimate of
+        their request size (QDRANT_UPSERT_BATCH_BYTES); up to
+        QDRANT_UPSERT_PARALLEL are sent concurrently and each is retried on
+        transient errors. Without QDRANT_UPSERT_WAIT, Qdrant acknowledges a
+        chunk once queued and a final barrier waits until all are applied, so
+        the points are searchable when this returns. Raises if a chunk still
+        fails; the other chunks are kept.
+        """
+        chunks = self._make_upsert_chunks(points)
+        if not chunks:
+            return
+
+        target = self._target(tenant_id)
+        # Local storage isn't safe for concurrent writers
+        parallel = settings.QDRANT_UPSERT_PARALLEL if self.async_qdrant is not None else 1
+        written, failed = [], 0
+
+        with ThreadPoolExecutor(max_workers=max(1, min(parallel, len(chunks)))) as pool:
+            futures = {pool.submit(self._upsert_chunk, target, chunk): chunk for chunk in chunks}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                    written.extend(futures[future])
+                except Exception as e:
+                    failed += 1
+                    logger.error(f"Upsert of {len(futures[future])} points failed for {tenant_id}: {e}")
+
+        if written and not settings.QDRANT_UPSERT_WAIT:
+            self._write_barrier(tenant_id)
+        self._replicate_upsert(namespace, written)
+        product_store.invalidate(tenant_id, [point.payload["product_id"] for point in written])
+
+        if failed:
+            raise Exception(f"{failed} of {len(chunks)} upsert chunks failed for tenant {tenant_id}")
+
+    def _estimate_point_bytes(self, point: PointStruct) -> int:
+        """Rough JSON size of a point in an upsert request."""
+        dense = dense_vector_of(point.vector) or []
+        sparse = point.vector.get(SPARSE_VECTOR_NAME) if isinstance(point.vector, dict) else None
+        # ~22 characters per float, ~30 per sparse index/value pair
+        return (
+            22 * len(dense)
+            + (30 * len(sparse.indices) if sparse else 0)
+            + len(json.dumps(point.payload, default=str))
         )
 
-        self.qdrant.upsert(
-            collection_name=self.collection_name,
-            points=[point],
-        )
-
-    def upsert_products_batch(self, products: list[dict]) -> int:
-        """Batch upsert products for efficiency."""
-        points = []
-        for product in products:
-            embedding = self.create_embedding(product["combined_text"])
-            point = PointStruct(
-                id=hash(f"{product['tenant_id']}_{product['id']}") % (2**63),
-                vector=embedding,
-                payload={
-                    "product_id": product["id"],
-                    "tenant_id": product["tenant_id"],
-                    "name": product["name"],
-                    "price": product["price"],
-                    "description": product["short_description"],
-                    "image_url": product["image_url"],
-                    "permalink": product["permalink"],
-                    "categories": product["categories"],
-                    "stock_status": product["stock_status"],
-                },
-            )
-            points.append(point)
-
-        if points:
-            self.qdrant.upsert(
-                collection_name=self.collection_name,
-                points=points,
+    def _make_upsert_chunks(self, points: list[PointStruct]) -> list[list[PointStruct]]:
+        """Group points into request-sized upsert chunks."""
+        chunks: list[list[PointStruct]] = []
+        current: list[PointStruct] = []
+        current_bytes = 0
+
+        for point in points:
+            size = self._estimate_point_bytes(point)
+            if current and (
+                len(current) >= settings.QDRANT_UPSERT_BATCH_POINTS
+                or current_bytes + size > settings.QDRANT_UPSERT_BATCH_BYTES
+            ):
+                chunks.append(current)
+                current, current_bytes = [], 0
+
+            current.append(point)
+            current_bytes += size
+
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _upsert_chunk(self, target: dict, points: list[PointStruct]) -> None:
+        """Upsert one chunk, retrying transient failures with exponential backoff."""
+        retries = settings.QDRANT_UPSERT_RETRIES
+        for attempt in range(retries + 1):
+            try:
+                self.qdrant.upsert(**target, points=points, wait=settings.QDRANT_UPSERT_WAIT)
+                return
+            except UnexpectedResponse as e:
+                # Client errors (bad request, missing collection) won't succeed on retry
+                if attempt == retries or (e.status_code < 500 and e.status_code != 429):
+                    raise
+            except Exception:
+                if attempt == retries:
+                    raise
+            time.sleep(0.5 * 2**attempt)
+
+    def _write_barrier(self, tenant_id: str) -> None:
+        """
+        Wait until a tenant's earlier acknowledged (wait=False) writes are applied.
+
+        Each shard applies updates in order, so a filtered delete that matches
+        nothing - sent to every shard, with wait=True - completes after them.
+        """
+        self.qdrant.delete(
+            **self._target(tenant_id),
+            points_selector=Filter(
+                must=[FieldCondition(key="tenant_id", match=MatchValue(value=WRITE_BARRIER_NAMESPACE))]
+            ),
+            wait=True,
+        )
+
+    def update_payload(self, tenant_id: str, updates: list[dict]) -> dict:
+        """
+        Apply price/stock changes to stored points without re-embedding.
+
+        Each update is {"id": product_id, **fields} with fields from
+        PAYLOAD_UPDATE_FIELDS. Points sharing the same new values are updated
+        with one set_payload operation, all in a single batch request per page.
+        Changes go to the active catalog version and to a staged build, if
+        any, so a running full sync doesn't publish stale values.
+
+        Vectors and embedding text are left as they are. The content hash is
+        cleared, so the next sync rewrites these points with the catalog's
+        values (re-embedding only if their text changed) instead of keeping a
+        manual edit it considers unchanged. Returns counts: updated, and not_found (product IDs without a point).
+        """
+        changes = {}
+        for update in updates:
+            fields = {key: update[key] for key in PAYLOAD_UPDATE_FIELDS if update.get(key) is not None}
+            if "price" in fields:
+                fields["price"] = float(fields["price"])
+            if fields:
+                # Later updates for the same product win
+                changes.setdefault(str(update["id"]), {}).update(fields)
+
+        if not changes or not self._tenant_exists(tenant_id):
+            return {"updated": 0, "not_found": list(changes)}
+
+        state = self.get_catalog_version(tenant_id)
+        namespaces = {self._namespace(tenant_id)}
+        if state.get("staging_version"):
+            namespaces.add(self._catalog_namespace(tenant_id, state["staging_version"]))
+
+        found = set()
+        for namespace in namespaces:
+            point_changes = {
+                self._point_id(namespace, product_id): (product_id, fields)
+                for product_id, fields in changes.items()
+            }
+            existing = self._get_content_hashes(
+                [{"id": product_id, "tenant_id": tenant_id} for product_id in changes],
+                {tenant_id: namespace},
+            )
+            found.update(point_changes[point_id][0] for point_id in existing)
+
+            payloads = {
+                point_id: {**point_changes[point_id][1], "content_hash": None}
+                for point_id in existing
+            }
+            self._set_payloads(tenant_id, payloads)
+            if self.hot_replicas is not None:
+                self.hot_replicas.apply_payload(namespace, payloads)
+
+        product_store.invalidate(tenant_id, list(found))
+        if found:
+            self._bump_revision(tenant_id)
+
+        return {"updated": len(found), "not_found": [p for p in changes if p not in found]}
+
+    def _set_payloads(self, tenant_id: str, payloads: dict[str, dict]) -> None:
+        """Set partial payloads on points, grouping points that get identical values."""
+        target = self._target(tenant_id)
+        groups = defaultdict(list)
+        for point_id, fields in payloads.items():
+            groups[json.dumps(fields, sort_keys=True)].append(point_id)
+
+        operations = [
+            SetPayloadOperation(
+                set_payload=SetPayload(
+                    payload=json.loads(fields),
+                    points=point_ids[i : i + POINT_PAGE_SIZE],
+                    shard_key=target.get("shard_key_selector"),
+                )
+            )
+            for fields, point_ids in groups.items()
+            for i in range(0, len(point_ids), POINT_PAGE_SIZE)
+        ]
+        for i in range(0, len(operations), POINT_PAGE_SIZE):
+            self.qdrant.batch_update_points(
+                collection_name=target["collection_name"],
+                update_operations=operations[i : i + POINT_PAGE_SIZE],
+            )
+
+    def _get_content_hashes(self, products: list[dict], namespaces: dict[str, str]) -> dict[str, str]:
+        """Fetch stored content hashes for the given products' points."""
+        ids_by_tenant = defaultdict(set)
+        for p in products:
+            ids_by_tenant[p["tenant_id"]].add(self._point_id(namespaces[p["tenant_id"]], p["id"]))
+        hashes = {}
+
+        for tenant_id, ids in ids_by_tenant.items():
+            point_ids = list(ids)
+            for i in range(0, len(point_ids), POINT_PAGE_SIZE):
+                records = self.qdrant.retrieve(
+                    **self._target(tenant_id),
+                    ids=point_ids[i : i + POINT_PAGE_SIZE],
+                    with_payload=["content_hash"],
+                    with_vectors=False,
+                )
+                for record in records:
+                    hashes[record.id] = (record.payload or {}).get("content_hash")
+
+        return hashes
+
+    def _scroll_tenant_points(self, namespace: str) -> dict[str, dict]:
+        """Map point ID -> payload (product_id, content_hash) for all points in a catalog namespace."""
+        points = {}
+        offset = None
+
+        while True:
+            records, offset = self.qdrant.scroll(
+                **self._target(self._tenant_of(namespace)),
+                scroll_filter=Filter(
+                    must=[FieldCondition(key="tenant_id", match=MatchValue(value=namespace))]
+                ),
+                limit=POINT_PAGE_SIZE,
+                offset=offset,
+                with_payload=["product_id", "content_hash"],
+                with_vectors=False,
             )
+            for record in records:
+                points[record.id] = record.payload or {}
+            if offset is None:
+                break
 
-        return len(points)
+        return points
 
-    def search(
+    def _delete_points(self, tenant_id: str, point_ids: list) -> int:
+        """Delete a tenant's points by ID in bulk. Returns count deleted."""
+        for i in range(0, len(point_ids), POINT_PAGE_SIZE):
+            self.qdrant.delete(
+                **self._target(tenant_id),
+                points_selector=PointIdsList(points=point_ids[i : i + POINT_PAGE_SIZE]),
+            )
+        if self.hot_replicas is not None and point_ids:
+            self.hot_replicas.apply_delete(point_ids)
+        if point_ids:
+            product_store.invalidate(tenant_id)
+        return len(point_ids)
+
+    async def search(
         self,
         query: str,
         tenant_id: str,
         top_k: int = 5,
         score_threshold: Optional[float] = 0.3,
+        filters: Optional[list[Union[FieldCondition, Filter]]] = None,
+        mode: Optional[str] = None,
     ) -> list[dict]:
         """
         SECURITY-CRITICAL: Search products with HARD tenant filter.
         This ensures complete data isolation between retailers.
+
+        Optional `filters` (e.g. from QueryConstraints.to_qdrant_filters()) are
+        applied inside the vector search, so top_k is exact without over-fetching.
+        `mode` ("dense" or "hybrid", default SEARCH_MODE) - see _build_query.
         """
-        # Convert query to vector
-        query_vector = self.create_embedding(query)
+        if not await self._tenant_exists_async(tenant_id):
+            return []
+
+        # Convert query to vector (cached, single-flight)
+        query_vector = await self.embed_query(query)
+        namespace = await self._namespace_async(tenant_id)
+        hybrid = await self._use_hybrid(tenant_id, mode)
+        target = self._target(tenant_id)
+
+        # Small tenants are searched in process memory (namespace-scoped, so the
+        # tenant filter is implicit); unsupported filters fall through to Qdrant
+        hits = self._search_replica(
+            tenant_id, namespace, query, query_vector, filters, top_k, score_threshold, hybrid
+        )
+        if hits is not None:
+            return self._remember_products(tenant_id, [self._format_hit(hit) for hit in hits])
 
-        # HARD FILTER: tenant_id must match exactly
+        # HARD FILTER: tenant_id must match exactly (the tenant's active catalog version)
         # This happens at the database level - zero risk of data leakage
         tenant_filter = Filter(
-            must=[FieldCondition(key="tenant_id", match=MatchValue(value=tenant_id))]
+            must=[
+                FieldCondition(key="tenant_id", match=MatchValue(value=namespace)),
+                *(filters or []),
+            ]
+        )
+
+        requests = self._build_query(
+            query, query_vector, tenant_filter, top_k, score_threshold, hybrid,
+            shard_key=target.get("shard_key_selector"),
+        )
+        responses = await self._qdrant_async(
+            "query_batch_points",
+            collection_name=target["collection_name"],
+            requests=requests,
+        )
+
+        return self._remember_products(
+            tenant_id,
+            await self._format_hits(tenant_id, responses, query_vector, score_threshold),
+        )
+
+    async def search_batch(
+        self,
+        queries: list[str],
+        tenant_id: str,
+        top_k: int = 5,
+        score_threshold: Optional[float] = 0.3,
+        filters: Optional[list[Optional[list[Union[FieldCondition, Filter]]]]] = None,
+        mode: Optional[str] = None,
+    ) -> list[list[dict]]:
+        """
+        Run several searches for one tenant in a single round trip each to
+        the embedding provider and Qdrant.
+
+        All queries are embedded in one request and searched with one
+        query_batch_points call. `filters`, if given, holds per-query filter
+        conditions aligned with `queries`. Returns one result list per query.
+
+        SECURITY-CRITICAL: every query carries the HARD tenant filter.
+        """
+        if not queries:
+            return []
+        if not await self._tenant_exists_async(tenant_id):
+            return [[] for _ in queries]
+
+        query_vectors = await self.embed_queries(queries)
+        namespace = await self._namespace_async(tenant_id)
+        hybrid = await self._use_hybrid(tenant_id, mode)
+        target = self._target(tenant_id)
+        filters = filters or [None] * len(queries)
+
+        results = []
+        for query, vector, query_filters in zip(queries, query_vectors, filters):
+            hits = self._search_replica(
+                tenant_id, namespace, query, vector, query_filters, top_k, score_threshold, hybrid
+            )
+            results.append(None if hits is None else [self._format_hit(hit) for hit in hits])
+
+        # Queries the hot replica couldn't answer go to Qdrant in one batch
+        pending = [i for i, hits in enumerate(results) if hits is None]
+        if not pending:
+            for hits in results:
+                self._remember_products(tenant_id, hits)
+            return results
+
+        # One or three requests per query (see _build_query)
+        requests_per_query = [
+            self._build_query(
+                queries[i],
+                query_vectors[i],
+                Filter(
+                    must=[
+                        FieldCondition(key="tenant_id", match=MatchValue(value=namespace)),
+                        *(filters[i] or []),
+                    ]
+                ),
+                top_k,
+                score_threshold,
+                hybrid,
+                shard_key=target.get("shard_key_selector"),
+            )
+            for i in pending
+        ]
+
+        responses = await self._qdrant_async(
+            "query_batch_points",
+            collection_name=target["collection_name"],
+            requests=[request for requests in requests_per_query for request in requests],
         )
 
-        # Search with filter using query_points (new Qdrant API)
-        results = self.qdrant.query_points(
-            collection_name=self.collection_name,
+        offset = 0
+        for i, requests in zip(pending, requests_per_query):
+            query_responses = responses[offset : offset + len(requests)]
+            offset += len(requests)
+            results[i] = await self._format_hits(tenant_id, query_responses, query_vectors[i], score_threshold)
+        for hits in results:
+            self._remember_products(tenant_id, hits)
+        return results
+
+    async def _use_hybrid(self, tenant_id: str, mode: Optional[str]) -> bool:
+        """Whether to run a hybrid query: requested, and the tenant's collection has sparse vectors."""
+        if (mode or settings.SEARCH_MODE) != "hybrid":
+            return False
+        name = self._target(tenant_id)["collection_name"]
+        if name in self._sparse_support:
+            return self._sparse_support[name]
+        return await asyncio.to_thread(self._supports_sparse, name)
+
+    def _build_query(
+        self,
+        query: str,
+        query_vector: list[float],
+        query_filter: Filter,
+        top_k: int,
+        score_threshold: Optional[float],
+        hybrid: bool,
+        shard_key: Optional[str] = None,
+    ) -> list[QueryRequest]:
+        """
+        Build the requests for a dense or hybrid query (see _format_hits).
+
+        Dense queries are one request. Hybrid queries prefetch candidates from
+        the dense vector and the lexical sparse vector (exact names, SKUs,
+        brand terms) and fuse both rankings server-side with reciprocal rank
+        fusion. Two payload-free requests over the same filter go with it: a
+        dense one supplying the cosine scores hits report and score_threshold
+        applies to, and a lexical one naming the HYBRID_LEXICAL_TOP_N best
+        lexical matches, which are exempt from the threshold.
+        The sparse leg is encoded locally, so it adds no API call.
+        """
+        sparse_query = sparse_encoder.encode_query(query) if hybrid else None
+        if not sparse_query or not sparse_query.indices:
+            return [QueryRequest(
+                shard_key=shard_key,
+                query=query_vector,
+                filter=query_filter,
+                params=search_params(),
+                limit=top_k,
+                score_threshold=score_threshold,
+                with_payload=RESULT_PAYLOAD_FIELDS,
+            )]
+
+        prefetch_limit = top_k * settings.HYBRID_PREFETCH_MULTIPLIER
+        dense = QueryRequest(
+            shard_key=shard_key,
             query=query_vector,
-            query_filter=tenant_filter,
-            limit=top_k,
+            filter=query_filter,
+            params=search_params(),
+            limit=prefetch_limit,
             score_threshold=score_threshold,
+            with_payload=False,
+        )
+        fused = QueryRequest(
+            shard_key=shard_key,
+            prefetch=[
+                Prefetch(
+                    query=query_vector,
+                    filter=query_filter,
+                    params=search_params(),
+                    limit=prefetch_limit,
+                    score_threshold=score_threshold,
+                ),
+                Prefetch(
+                    query=sparse_query,
+                    using=SPARSE_VECTOR_NAME,
+                    filter=query_filter,
+                    limit=prefetch_limit,
+                ),
+            ],
+            query=FusionQuery(fusion=Fusion.RRF),
+            filter=query_filter,
+            limit=top_k,
+            with_payload=RESULT_PAYLOAD_FIELDS,
+        )
+        lexical = QueryRequest(
+            shard_key=shard_key,
+            query=sparse_query,
+            using=SPARSE_VECTOR_NAME,
+            filter=query_filter,
+            # Qdrant needs a positive limit; 0 (no exemption) is applied in _format_hits
+            limit=max(settings.HYBRID_LEXICAL_TOP_N, 1),
+            with_payload=False,
         )
+        return [fused, dense, lexical]
+
+    async def _format_hits(
+        self,
+        tenant_id: str,
+        responses: list,
+        query_vector: list[float],
+        score_threshold: Optional[float],
+    ) -> list[dict]:
+        """
+        Search results from the responses to one query's _build_query requests.
+
+        Fused (hybrid) hits report dense cosine similarity rather than the RRF
+        rank score, so scores mean the same in both modes. Hits below
+        score_threshold are dropped, unless they are among the best lexical
+        matches (an exact SKU has little semantic similarity to its product).
+        Cosines come from the dense request; the few lexical-only hits outside
+        it have their vectors fetched.
+        """
+        if len(responses) == 1:
+            return [self._format_hit(hit) for hit in responses[0].points]
+
+        fused, dense, lexical = responses
+        lexical_ids = {hit.id for hit in lexical.points[: settings.HYBRID_LEXICAL_TOP_N]}
+        scores = {hit.id: hit.score for hit in dense.points}
+        missing = [hit.id for hit in fused.points if hit.id not in scores]
+        if missing:
+            records = await self._qdrant_async(
+                "retrieve",
+                **self._target(tenant_id),
+                ids=missing,
+                with_payload=False,
+                with_vectors=[DENSE_VECTOR_NAME],
+            )
+            for record in records:
+                vector = dense_vector_of(record.vector)
+                if vector:
+                    # Embeddings are unit length, so the dot product is the cosine
+                    scores[record.id] = sum(a * b for a, b in zip(query_vector, vector))
 
-        # Format results (query_points returns QueryResponse with .points)
         return [
-            {
-                "score": hit.score,
-                "product_id": hit.payload["product_id"],
-                "name": hit.payload["name"],
-                "price": hit.payload["price"],
-                "description": hit.payload["description"],
-                "image_url": hit.payload["image_url"],
-                "permalink": hit.payload["permalink"],
-                "categories": hit.payload["categories"],
-                "stock_status": hit.payload["stock_status"],
-            }
-            for hit in results.points
+            {"score": scores.get(hit.id, 0.0), **self._product_record(hit.payload)}
+            for hit in fused.points
+            if hit.id in lexical_ids
+            or (hit.id in scores and (score_threshold is None or scores[hit.id] >= score_threshold))
         ]
 
+    def _format_hit(self, hit) -> dict:
+        """Format a scored point (with its reported score) as a search result."""
+        return {"score": hit.score, **self._product_record(hit.payload)}
+
+    def _product_record(self, payload: dict) -> dict:
+        """Product fields of a search result (RESULT_PAYLOAD_FIELDS)."""
+        return {
+            "product_id": payload["product_id"],
+            "name": payload["name"],
+            "price": payload["price"],
+            "description": payload["description"],
+            "image_url": payload["image_url"],
+            "permalink": payload["permalink"],
+            "categories": payload["categories"],
+            "stock_status": payload["stock_status"],
+            # None for points written before attributes were stored in payloads
+            "attributes": self._payload_attributes(payload),
+        }
+
+    def _payload_attributes(self, payload: dict) -> Optional[dict]:
+        """Extracted attributes of a point as {name: {"value", "confidence"}}."""
+        if "attribute_confidence" not in payload:
+            return None
+        return {
+            name: {"value": payload[name], "confidence": confidence}
+            for name, confidence in payload["attribute_confidence"].items()
+            if name in payload
+        }
+
+    def _remember_products(self, tenant_id: str, results: list[dict]) -> list[dict]:
+        """Put search results' product records in the product store; returns results."""
+        product_store.put_many(
+            tenant_id, [{k: v for k, v in r.items() if k != "score"} for r in results]
+        )
+        return results
+
+    async def get_products(self, tenant_id: str, product_ids: list[str]) -> dict[str, dict]:
+        """
+        Product records (search result fields, without score) by product ID.
+
+        Served from the product store; misses are fetched from the tenant's
+        active catalog in one request. Unknown products are left out.
+        """
+        records = product_store.get_many(tenant_id, product_ids)
+        missing = [product_id for product_id in product_ids if product_id not in records]
+        if not missing or not await self._tenant_exists_async(tenant_id):
+            return records
+
+        namespace = await self._namespace_async(tenant_id)
+        points = await self._qdrant_async(
+            "retrieve",
+            **self._target(tenant_id),
+            ids=[self._point_id(namespace, product_id) for product_id in missing],
+            with_payload=RESULT_PAYLOAD_FIELDS,
+            with_vectors=False,
+        )
+        fetched = [self._product_record(point.payload) for point in points]
+        product_store.put_many(tenant_id, fetched)
+        records.update({record["product_id"]: record for record in fetched})
+        return records
+
     def delete_tenant_products(self, tenant_id: str) -> None:
-        """Delete all products for a tenant (for re-sync)."""
+        """Delete all products for a tenant, in every catalog version."""
+        if self.tenancy == "collection":
+            # Dropping the tenant's collection costs nothing proportional to other tenants
+            self.qdrant.delete_collection(self._tenant_collection(tenant_id))
+        elif self.tenancy == "shard_key" and self._tenant_exists(tenant_id):
+            self.qdrant.delete_shard_key(self.collection_name, shard_key=tenant_id)
+        else:
+            state = self.get_catalog_version(tenant_id)
+            namespaces = [tenant_id] + [
+                self._catalog_namespace(tenant_id, state[key])
+                for key in ("active_version", "staging_version")
+                if state.get(key)
+            ]
+            self.qdrant.delete(
+                collection_name=self.collection_name,
+                points_selector=Filter(
+                    must=[
+                        FieldCondition(key="tenant_id", match=MatchAny(any=namespaces))
+                    ]
+                ),
+            )
+
+        self._ready_tenants.discard(tenant_id)
+        product_store.invalidate(tenant_id)
+        if self.hot_replicas is not None:
+            for namespace in self.hot_replicas.namespaces():
+                if self._tenant_of(namespace) == tenant_id:
+                    self.hot_replicas.drop(namespace)
+        # Reset the version record, with a new revision so cached results are dropped
+        self._set_catalog_version(tenant_id, {"revision": uuid.uuid4().hex[:12]})
+        self._active_versions.pop(tenant_id, None)
+
+    # ==================== TENANCY ====================
+    #
+    # QDRANT_TENANCY decides where a tenant's points live:
+    #   shared     - one collection; isolation by the tenant_id payload filter
+    #   shard_key  - one custom-sharded collection with a shard key per tenant
+    #   collection - one collection per tenant ("<collection>__<tenant_id>")
+    # The tenant_id filter is applied in every mode (it also selects the
+    # catalog version). Migrate existing points with scripts/migrate_tenancy.py.
+
+    def _tenant_collection(self, tenant_id: str) -> str:
+        """Collection name for a tenant in per-collection tenancy."""
+        return f"{self.collection_name}__{tenant_id}"
+
+    def _tenant_of(self, namespace: str) -> str:
+        """Tenant a catalog namespace ("tenant" or "tenant@version") belongs to."""
+        return namespace.split("@", 1)[0]
+
+    def _target(self, tenant_id: str) -> dict:
+        """Collection (and shard key) holding a tenant's points, as Qdrant call arguments."""
+        if self.tenancy == "collection":
+            return {"collection_name": self._tenant_collection(tenant_id)}
+        if self.tenancy == "shard_key":
+            return {"collection_name": self.collection_name, "shard_key_selector": tenant_id}
+        return {"collection_name": self.collection_name}
+
+    def _tenant_exists(self, tenant_id: str) -> bool:
+        """Whether a tenant's collection or shard key exists (positive results are cached)."""
+        if self.tenancy == "shared" or tenant_id in self._ready_tenants:
+            return True
+
+        if self.tenancy == "collection":
+            exists = self.qdrant.collection_exists(self._tenant_collection(tenant_id))
+        else:
+            info = self.qdrant.collection_cluster_info(self.collection_name)
+            shards = [*info.local_shards, *info.remote_shards]
+            exists = any(shard.shard_key == tenant_id for shard in shards)
+
+        if exists:
+            self._ready_tenants.add(tenant_id)
+        return exists
+
+    async def _tenant_exists_async(self, tenant_id: str) -> bool:
+        """Non-blocking _tenant_exists for the request path."""
+        if self.tenancy == "shared" or tenant_id in self._ready_tenants:
+            return True
+        return await asyncio.to_thread(self._tenant_exists, tenant_id)
+
+    def _ensure_tenant(self, tenant_id: str) -> None:
+        """Create a tenant's collection or shard key before its first write."""
+        if self._tenant_exists(tenant_id):
+            return
+
+        if self.tenancy == "collection":
+            self._create_collection(self._tenant_collection(tenant_id))
+        else:
+            self.qdrant.create_shard_key(self.collection_name, shard_key=tenant_id)
+            print(f"📦 Created shard key {tenant_id}")
+        self._ready_tenants.add(tenant_id)
+
+    # ==================== CATALOG VERSIONS ====================
+    #
+    # Full catalog syncs are built blue/green: products are written into a
+    # staging namespace "tenant@version" while searches keep reading the active
+    # one, then a per-tenant pointer is switched and the old version deleted.
+    # Tenants that never ran a versioned build use the plain tenant_id.
+    #
+    # The record also carries a revision, changed by every write that searches
+    # can see (incremental upserts, payload updates, deletes). Search caches
+    # key on get_catalog_revision, so ingestion invalidates them everywhere
+    # within CATALOG_VERSION_CACHE_TTL and cache TTLs can be long.
+
+    def _catalog_namespace(self, tenant_id: str, version: Optional[str]) -> str:
+        """Physical namespace (the `tenant_id` payload value) of a catalog version."""
+        # "@" separates tenant and version; a tenant named "x@..." could read x's catalog
+        if "@" in tenant_id:
+            raise ValueError(f"Invalid tenant_id: {tenant_id!r}")
+        return f"{tenant_id}@{version}" if version else tenant_id
+
+    def _version_point_id(self, tenant_id: str) -> str:
+        """Point ID of a tenant's record in the catalog versions collection."""
+        return str(uuid.uuid5(POINT_ID_NAMESPACE, f"catalog_version:{tenant_id}"))
+
+    def get_catalog_version(self, tenant_id: str) -> dict:
+        """Read a tenant's version record (active_version, staging_version, published_at, revision)."""
+        records = self.qdrant.retrieve(
+            collection_name=self.catalog_versions_collection,
+            ids=[self._version_point_id(tenant_id)],
+            with_payload=True,
+        )
+        return (records[0].payload or {}) if records else {}
+
+    def _set_catalog_version(self, tenant_id: str, state: dict) -> None:
+        """Write a tenant's version record."""
+        self.qdrant.upsert(
+            collection_name=self.catalog_versions_collection,
+            points=[
+                PointStruct(
+                    id=self._version_point_id(tenant_id),
+                    vector={},
+                    payload={**state, "tenant_id": tenant_id},
+                )
+            ],
+        )
+
+    def _cached_version(self, tenant_id: str) -> Optional[dict]:
+        """Cached active_version and revision of a tenant, if still fresh."""
+        entry = self._active_versions.get(tenant_id)
+        if entry and entry[1] > time.monotonic():
+            return entry[0]
+        return None
+
+    def _remember_version(self, tenant_id: str, state: dict) -> dict:
+        """Cache a tenant's active_version and revision for CATALOG_VERSION_CACHE_TTL seconds."""
+        expiry = time.monotonic() + settings.CATALOG_VERSION_CACHE_TTL
+        entry = {"active_version": state.get("active_version"), "revision": state.get("revision")}
+        self._active_versions[tenant_id] = (entry, expiry)
+        return entry
+
+    async def _cached_version_async(self, tenant_id: str) -> dict:
+        """Active version and revision of a tenant (cached briefly), without blocking."""
+        entry = self._cached_version(tenant_id)
+        if entry is None:
+            records = await self._qdrant_async(
+                "retrieve",
+                collection_name=self.catalog_versions_collection,
+                ids=[self._version_point_id(tenant_id)],
+                with_payload=["active_version", "revision"],
+            )
+            entry = self._remember_version(tenant_id, (records[0].payload or {}) if records else {})
+        return entry
+
+    def _namespace(self, tenant_id: str) -> str:
+        """Namespace of a tenant's active catalog version (cached briefly)."""
+        entry = self._cached_version(tenant_id)
+        if entry is None:
+            entry = self._remember_version(tenant_id, self.get_catalog_version(tenant_id))
+        return self._catalog_namespace(tenant_id, entry["active_version"])
+
+    async def _namespace_async(self, tenant_id: str) -> str:
+        """Non-blocking _namespace for the request path."""
+        entry = await self._cached_version_async(tenant_id)
+        return self._catalog_namespace(tenant_id, entry["active_version"])
+
+    async def get_catalog_namespace(self, tenant_id: str) -> str:
+        """
+        Namespace ("tenant" or "tenant@version") searches of a tenant read.
+
+        Changes only when a catalog version is published, unlike the revision.
+        """
+        return await self._namespace_async(tenant_id)
+
+    async def get_catalog_revision(self, tenant_id: str) -> str:
+        """
+        Tag identifying what searches of a tenant currently see.
+
+        Changes when a catalog version is published and on every other
+        visible write; use it in cache keys for per-tenant search results.
+        """
+        entry = await self._cached_version_async(tenant_id)
+        return f"{entry['active_version'] or '-'}:{entry['revision'] or 0}"
+
+    def _bump_revision(self, tenant_id: str) -> None:
+        """Give a tenant a new revision (invalidates its cached search results)."""
+        revision = uuid.uuid4().hex[:12]
+        state = self.get_catalog_version(tenant_id)
+        if state:
+            # Only this field: a concurrent build may be updating the others
+            self.qdrant.set_payload(
+                collection_name=self.catalog_versions_collection,
+                payload={"revision": revision},
+                points=[self._version_point_id(tenant_id)],
+            )
+        else:
+            self._set_catalog_version(tenant_id, {"revision": revision})
+        self._remember_version(tenant_id, {**state, "revision": revision})
+        if self.hot_replicas is not None:
+            # The write was applied to this process's replica already
+            self.hot_replicas.advance_revision(
+                self._catalog_namespace(tenant_id, state.get("active_version")),
+                state.get("revision"),
+                revision,
+            )
+
+    def begin_catalog_build(self, tenant_id: str) -> str:
+        """
+        Start a full catalog build for a tenant. Returns the staging version.
+
+        Write the catalog with upsert_products_batch(..., version=version), then
+        publish_catalog_build (or discard_catalog_build). Searches keep using the
+        active version meanwhile. Leftovers of an abandoned build are removed.
+        """
+        self._ensure_tenant(tenant_id)
+        state = self.get_catalog_version(tenant_id)
+        if state.get("staging_version"):
+            self._delete_namespace(self._catalog_namespace(tenant_id, state["staging_version"]))
+
+        version = f"{time.strftime('%Y%m%d%H%M%S', time.gmtime())}-{uuid.uuid4().hex[:6]}"
+        self._set_catalog_version(tenant_id, {**state, "staging_version": version})
+        return version
+
+    def publish_catalog_build(
+        self,
+        tenant_id: str,
+        version: str,
+        gc_delay: Optional[float] = None,
+    ) -> None:
+        """
+        Make a staged catalog version active, then delete the previous one.
+
+        The old version is kept for `gc_delay` seconds (default
+        CATALOG_VERSION_CACHE_TTL) so workers still holding the old pointer
+        keep getting results until their cache expires.
+        """
+        state = self.get_catalog_version(tenant_id)
+        if state.get("staging_version") != version:
+            raise ValueError(f"Catalog version {version} is not staged for tenant {tenant_id}")
+
+        previous = self._catalog_namespace(tenant_id, state.get("active_version"))
+        state = {
+            **state,
+            "active_version": version,
+            "staging_version": None,
+            "published_at": time.time(),
+        }
+        self._set_catalog_version(tenant_id, state)
+        self._remember_version(tenant_id, state)
+        product_store.invalidate(tenant_id)
+        print(f"📦 Catalog version {version} active for {tenant_id}")
+
+        time.sleep(settings.CATALOG_VERSION_CACHE_TTL if gc_delay is None else gc_delay)
+        self._delete_namespace(previous)
+
+    def discard_catalog_build(self, tenant_id: str, version: str) -> None:
+        """Delete a staged catalog version without publishing it."""
+        self._delete_namespace(self._catalog_namespace(tenant_id, version))
+        state = self.get_catalog_version(tenant_id)
+        if state.get("staging_version") == version:
+            self._set_catalog_version(tenant_id, {**state, "staging_version": None})
+
+    def _delete_namespace(self, namespace: str) -> None:
+        """Delete every point stored under a catalog namespace."""
         self.qdrant.delete(
-            collection_name=self.collection_name,
+            **self._target(self._tenant_of(namespace)),
             points_selector=Filter(
-                must=[
-                    FieldCondition(key="tenant_id", match=MatchValue(value=tenant_id))
-                ]
+                must=[FieldCondition(key="tenant_id", match=MatchValue(value=namespace))]
             ),
         )
+        if self.hot_replicas is not None:
+            self.hot_replicas.drop(namespace)
+
+    # ==================== HOT REPLICAS ====================
+    #
+    # With HOT_REPLICA_ENABLED, catalog namespaces of up to HOT_REPLICA_MAX_POINTS
+    # points are copied into process memory and searched with numpy (see
+    # app/services/hot_replica.py). A replica is loaded in the background on
+    # the first search - Qdrant answers until it is ready - and reloaded every
+    # HOT_REPLICA_TTL seconds. Writes made through this service apply to it
+    # immediately; writes from other processes show up after the next reload.
+
+    def _search_replica(
+        self,
+        tenant_id: str,
+        namespace: str,
+        query: str,
+        query_vector: list[float],
+        filters: Optional[list[Union[FieldCondition, Filter]]],
+        top_k: int,
+        score_threshold: Optional[float],
+        hybrid: bool,
+    ) -> Optional[list]:
+        """Hits from the namespace's hot replica, or None to search Qdrant instead."""
+        version = self._cached_version(tenant_id)
+        if version is None:
+            return None
+        replica = self._hot_replica(tenant_id, namespace, version["revision"])
+        if replica is None:
+            return None
+
+        hits = replica.search(
+            query_vector,
+            sparse_encoder.encode_query(query) if hybrid else None,
+            filters,
+            top_k,
+            score_threshold,
+            prefetch_limit=top_k * settings.HYBRID_PREFETCH_MULTIPLIER,
+        )
+        if hits is None:
+            self.hot_replicas.fallbacks += 1
+        else:
+            self.hot_replicas.hits += 1
+        return hits
+
+    def _hot_replica(self, tenant_id: str, namespace: str, revision: Optional[str]) -> Optional[TenantReplica]:
+        """
+        A namespace's replica if loaded at the tenant's current catalog
+        revision; starts a background (re)load when one is due.
+
+        Search results are cached per revision, so a replica missing another
+        process's writes must not answer for the new revision.
+        """
+        if self.hot_replicas is None:
+            return None
+
+        generation = self.hot_replicas.begin_load(namespace, revision)
+        if generation is not None:
+            task = asyncio.create_task(
+                asyncio.to_thread(self._load_replica, tenant_id, namespace, generation, revision)
+            )
+            # Keep a reference so the task isn't garbage-collected mid-load
+            self._replica_loads.add(task)
+            task.add_done_callback(self._replica_loads.discard)
+
+        # A replica due for a TTL reload keeps serving until the new one is ready
+        return self.hot_replicas.get(namespace, revision)
+
+    def _load_replica(self, tenant_id: str, namespace: str, generation: int, revision: Optional[str]) -> None:
+        """Copy a namespace's points into a hot replica, unless it is too large."""
+        try:
+            target = self._target(tenant_id)
+            namespace_filter = Filter(
+                must=[FieldCondition(key="tenant_id", match=MatchValue(value=namespace))]
+            )
+            count = self.qdrant.count(**target, count_filter=namespace_filter, exact=True).count
+            if count > self.hot_replicas.max_points:
+                self.hot_replicas.mark_oversized(namespace)
+                return
+
+            records, offset = [], None
+            while True:
+                page, offset = self.qdrant.scroll(
+                    **target,
+                    scroll_filter=namespace_filter,
+                    limit=POINT_PAGE_SIZE,
+                    offset=offset,
+                    with_payload=True,
+                    with_vectors=True,
+                )
+                records.extend(page)
+                if offset is None:
+                    break
+
+            self.hot_replicas.put(namespace, TenantReplica(*self._replica_rows(records)), generation, revision)
+            logger.info(f"Hot replica loaded for {namespace} ({len(records)} points)")
+        except Exception as e:
+            logger.warning(f"Hot replica load failed for {namespace}: {e}")
+            self.hot_replicas.end_load(namespace)
+
+    def _replica_rows(self, points: list) -> tuple[list, list, list, list]:
+        """IDs, dense vectors, sparse vectors and payloads of points or records."""
+        ids, vectors, sparse_vectors, payloads = [], [], [], []
+        for point in points:
+            dense = dense_vector_of(point.vector)
+            if dense is None:
+                continue
+            ids.append(point.id)
+            vectors.append(dense)
+            sparse_vectors.append(
+                point.vector.get(SPARSE_VECTOR_NAME) if isinstance(point.vector, dict) else None
+            )
+            payloads.append(point.payload or {})
+        return ids, vectors, sparse_vectors, payloads
+
+    def _replicate_upsert(self, namespace: str, points: list[PointStruct]) -> None:
+        """Apply points just written to Qdrant to the namespace's hot replica."""
+        if self.hot_replicas is not None:
+            self.hot_replicas.apply_upsert(namespace, *self._replica_rows(points))
 
 
 # Singleton instance
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Quantization / Dimension Benchmark
+Measures recall@k and latency of reduced-dimension and quantized vectors
+against the full-precision baseline, using a tenant's real product vectors.
+
+Usage:
+    python scripts/benchmark_quantization.py <tenant_id> [k] [num_queries]
+
+Example:
+    python scripts/benchmark_quantization.py pullbear 10 200
+
+Each configuration (dimensions x quantization) is loaded into a temporary
+collection on the configured Qdrant server, queried, and dropped again.
+The baseline is exact cosine top-k over the stored vectors. Queries are a
+random sample of product vectors (each product's own point is excluded).
+
+Note: local/in-memory Qdrant does not emulate quantization, so run this
+against a Qdrant server to measure scalar/binary modes meaningfully.
+"""
+
+import sys
+import time
+import random
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from qdrant_client.models import (
+    Distance,
+    VectorParams,
+    PointStruct,
+    Filter,
+    FieldCondition,
+    MatchValue,
+    HasIdCondition,
+)
+
+from app.services.vector_service import (
+    vector_service,
+    dense_vector_of,
+    quantization_config,
+    search_params,
+    shorten_embedding,
+)
+
+DIMENSION_OPTIONS = [1536, 1024, 512, 256]
+QUANTIZATION_OPTIONS = ["none", "scalar", "binary"]
+UPLOAD_BATCH_SIZE = 256
+
+
+def load_tenant_vectors(tenant_id: str) -> tuple[list, np.ndarray]:
+    """Load all point IDs and vectors for a tenant from the live collection."""
+    ids, vectors = [], []
+    namespace = vector_service._namespace(tenant_id)
+    offset = None
+    while True:
+        records, offset = vector_service.qdrant.scroll(
+            collection_name=vector_service.collection_name,
+            scroll_filter=Filter(
+                must=[FieldCondition(key="tenant_id", match=MatchValue(value=namespace))]
+            ),
+            limit=1000,
+            offset=offset,
+            with_payload=False,
+            with_vectors=True,
+        )
+        for r in records:
+            ids.append(r.id)
+            vectors.append(dense_vector_of(r.vector))
+        if offset is None:
+            break
+    return ids, np.array(vectors, dtype=np.float32)
+
+
+def exact_top_k(matrix: np.ndarray, query_rows: list[int], k: int) -> list[set[int]]:
+    """Exact cosine top-k (excluding the query's own row) for each query row."""
+    normed = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+    truth = []
+    for row in query_rows:
+        scores = normed @ normed[row]
+        scores[row] = -np.inf
+        truth.append(set(np.argpartition(-scores, k)[:k].tolist()))
+    return truth
+
+
+def bench_config(
+    matrix: np.ndarray,
+    query_rows: list[int],
+    truth: list[set[int]],
+    dimensions: int,
+    mode: str,
+    k: int,
+) -> dict:
+    """Load vectors into a temporary collection with one config and measure it."""
+    client = vector_service.qdrant
+    name = f"bench_{dimensions}d_{mode}_{int(time.time())}"
+
+    client.create_collection(
+        collection_name=name,
+        vectors_config=VectorParams(size=dimensions, distance=Distance.COSINE),
+        quantization_config=quantization_config(mode),
+    )
+    try:
+        shortened = [shorten_embedding(v.tolist(), dimensions) for v in matrix]
+        for i in range(0, len(shortened), UPLOAD_BATCH_SIZE):
+            client.upsert(
+                collection_name=name,
+                points=[
+                    PointStruct(id=j, vector=shortened[j])
+                    for j in range(i, min(i + UPLOAD_BATCH_SIZE, len(shortened)))
+                ],
+            )
+
+        recalls, latencies = [], []
+        for row, expected in zip(query_rows, truth):
+            start = time.perf_counter()
+            response = client.query_points(
+                collection_name=name,
+                query=shortened[row],
+                query_filter=Filter(must_not=[HasIdCondition(has_id=[row])]),
+                search_params=search_params(mode),
+                limit=k,
+            )
+            latencies.append((time.perf_counter() - start) * 1000)
+            found = {p.id for p in response.points}
+            recalls.append(len(found & expected) / k)
+
+        bytes_per_dim = {"none": 4, "scalar": 1, "binary": 1 / 8}[mode]
+        return {
+            "dimensions": dimensions,
+            "quantization": mode,
+            "recall": float(np.mean(recalls)),
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "ram_bytes_per_vector": int(dimensions * bytes_per_dim),
+        }
+    finally:
+        client.delete_collection(name)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python scripts/benchmark_quantization.py <tenant_id> [k] [num_queries]")
+        sys.exit(1)
+
+    tenant_id = sys.argv[1]
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    num_queries = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+
+    print(f"📂 Loading vectors for tenant: {tenant_id}")
+    _, matrix = load_tenant_vectors(tenant_id)
+    if len(matrix) <= k:
+        print(f"❌ Need more than {k} products, found {len(matrix)}")
+        sys.exit(1)
+
+    full_dims = matrix.shape[1]
+    query_rows = random.Random(42).sample(range(len(matrix)), min(num_queries, len(matrix)))
+    truth = exact_top_k(matrix, query_rows, k)
+    print(f"📊 {len(matrix)} vectors x {full_dims} dims, {len(query_rows)} queries, k={k}\n")
+
+    rows = []
+    for dimensions in [d for d in DIMENSION_OPTIONS if d <= full_dims]:
+        for mode in QUANTIZATION_OPTIONS:
+            rows.append(bench_config(matrix, query_rows, truth, dimensions, mode, k))
+            r = rows[-1]
+            print(
+                f"   {r['dimensions']:>5}d {r['quantization']:<7} "
+                f"recall@{k}={r['recall']:.3f}  p50={r['p50_ms']:.1f}ms  p95={r['p95_ms']:.1f}ms  "
+                f"RAM/vector={r['ram_bytes_per_vector']}B"
+            )
+
+    print(f"\n✨ Baseline: exact {full_dims}d float32 search (recall 1.000)")
+
+
+if __name__ == "__main__":
+    main()
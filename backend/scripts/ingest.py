@@ -53,6 +53,7 @@ def normalize_csv_row(row: pd.Series, tenant_id: str) -> dict:
         "name": name,
         "slug": name.lower().replace(" ", "-").replace("'", ""),
         "sku": str(row.get("sku", "")),
+        "brand": row.get("brand") if isinstance(row.get("brand"), str) else "",
         "price": str(row.get("price", "0")),
         "regular_price": str(row.get("regular_price", row.get("price", "0"))),
         "sale_price": str(row.get("sale_price", "")),
@@ -90,14 +91,6 @@ def ingest_csv(csv_path: str, tenant_id: str) -> int:
 
     print(f"✅ Normalized {len(products)} products")
 
-    # Clear existing products for this tenant
-    print(f"🗑️  Clearing existing products for tenant: {tenant_id}")
-    vector_service.delete_tenant_products(tenant_id)
-    try:
-        db_service.delete_tenant_products(tenant_id)
-    except Exception:
-        print("⚠️  Could not clear Supabase (may not be configured)")
-
     # Store in Supabase
     print("💾 Storing in Supabase...")
     try:
@@ -107,18 +100,37 @@ def ingest_csv(csv_path: str, tenant_id: str) -> int:
         print(f"⚠️  Supabase storage failed: {e}")
 
     # Store in Qdrant (vectors)
+    # Built as a new catalog version; searches use the current one until it's published
     print("🧠 Creating embeddings and storing in Qdrant...")
     print("   (This may take a while for large datasets)")
 
+    version = vector_service.begin_catalog_build(tenant_id)
     vector_count = 0
-    batch_size = 10  # Process in batches to show progress
-
-    for i in range(0, len(products), batch_size):
-        batch = products[i : i + batch_size]
-        vector_count += vector_service.upsert_products_batch(batch)
-        print(f"   Processed {min(i + batch_size, len(products))}/{len(products)}")
+    batch_size = 1000  # Embeddings are batched per request; chunk only to show progress
 
-    print(f"✅ Stored {vector_count} vectors in Qdrant")
+    try:
+        for i in range(0, len(products), batch_size):
+            batch = products[i : i + batch_size]
+            vector_count += vector_service.upsert_products_batch(batch, version=version)
+            print(f"   Processed {min(i + batch_size, len(products))}/{len(products)}")
+    except BaseException:
+        vector_service.discard_catalog_build(tenant_id, version)
+        raise
+
+    if vector_count < len(products):
+        vector_service.discard_catalog_build(tenant_id, version)
+        print(f"❌ Stored {vector_count}/{len(products)} vectors - keeping the current catalog")
+        return 0
+
+    vector_service.publish_catalog_build(tenant_id, version)
+    print(f"✅ Stored {vector_count} vectors in Qdrant (catalog version {version})")
+
+    # The CSV is now the live catalog: drop products that are no longer in it
+    try:
+        deleted = db_service.delete_stale_products(tenant_id, [p["id"] for p in products])
+        print(f"🗑️  Removed {deleted} stale products from Supabase")
+    except Exception as e:
+        print(f"⚠️  Supabase stale product cleanup failed: {e}")
 
     return vector_count
 
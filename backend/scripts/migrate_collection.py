@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Collection Migration Script
+Applies EMBEDDING_DIMENSIONS and QDRANT_QUANTIZATION to an existing collection.
+
+Usage:
+    EMBEDDING_DIMENSIONS=512 QDRANT_QUANTIZATION=scalar python scripts/migrate_collection.py
+    python scripts/migrate_collection.py --dry-run
+
+Quantization-only changes are applied in place (Qdrant rebuilds the quantized
+vectors in the background). A smaller EMBEDDING_DIMENSIONS, or a collection
+created before hybrid search (no sparse vector), copies every point into a new
+collection, shortening the stored vectors if needed, and points
+QDRANT_COLLECTION at it via an alias. For text-embedding-3 models the
+shortened vectors serve searches straight away, without calling the API.
+
+Content hashes and embedding-store keys include EMBEDDING_DIMENSIONS, and the
+embedding text isn't stored in Qdrant, so the next catalog sync re-embeds every
+product once (and writes sparse vectors for copied points).
+
+Deploy the same EMBEDDING_DIMENSIONS to the backend afterwards, so query
+embeddings match the stored vectors.
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from qdrant_client.models import (
+    Distance,
+    VectorParams,
+    PointStruct,
+    Disabled,
+    CreateAlias,
+    CreateAliasOperation,
+    DeleteAlias,
+    DeleteAliasOperation,
+)
+
+from app.core.config import settings
+from app.services.vector_service import (
+    vector_service,
+    quantization_config,
+    shorten_embedding,
+    dense_vector_of,
+    DENSE_VECTOR_NAME,
+    PAYLOAD_INDEXES,
+    SPARSE_VECTORS_CONFIG,
+)
+
+COPY_BATCH_SIZE = 256
+
+
+def resolve_alias(client, name: str) -> str | None:
+    """Return the collection an alias points to, or None if `name` is not an alias."""
+    for alias in client.get_aliases().aliases:
+        if alias.alias_name == name:
+            return alias.collection_name
+    return None
+
+
+def copy_vector(vector, dimensions: int):
+    """A point's vector(s) with the dense vector shortened to `dimensions`."""
+    dense = shorten_embedding(dense_vector_of(vector), dimensions)
+    if isinstance(vector, dict):
+        return {**vector, DENSE_VECTOR_NAME: dense}
+    return dense
+
+
+def copy_with_dimensions(client, source: str, target: str, dimensions: int) -> int:
+    """Copy all points from source to target, shortening vectors to `dimensions`."""
+    client.create_collection(
+        collection_name=target,
+        vectors_config=VectorParams(size=dimensions, distance=Distance.COSINE),
+        sparse_vectors_config=SPARSE_VECTORS_CONFIG,
+        quantization_config=quantization_config(),
+    )
+    for field, schema in PAYLOAD_INDEXES.items():
+        client.create_payload_index(collection_name=target, field_name=field, field_schema=schema)
+
+    copied = 0
+    offset = None
+    while True:
+        records, offset = client.scroll(
+            collection_name=source,
+            limit=COPY_BATCH_SIZE,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True,
+        )
+        if records:
+            client.upsert(
+                collection_name=target,
+                points=[
+                    PointStruct(
+                        id=r.id,
+                        vector=copy_vector(r.vector, dimensions),
+                        payload=r.payload,
+                    )
+                    for r in records
+                ],
+            )
+            copied += len(records)
+            print(f"   Copied {copied} points")
+        if offset is None:
+            break
+
+    return copied
+
+
+def main():
+    dry_run = "--dry-run" in sys.argv
+    client = vector_service.qdrant
+    name = settings.QDRANT_COLLECTION
+
+    source = resolve_alias(client, name) or name
+    params = client.get_collection(source).config.params
+    current_size = params.vectors.size
+    target_size = settings.EMBEDDING_DIMENSIONS
+    has_sparse = bool(params.sparse_vectors)
+
+    print(f"\n🚀 Sift Retail AI - Collection Migration")
+    print(f"=" * 40)
+    print(f"Collection: {name}" + (f" (alias of {source})" if source != name else ""))
+    print(f"Dimensions: {current_size} -> {target_size}")
+    print(f"Quantization: {settings.QDRANT_QUANTIZATION}")
+    print(f"Sparse vectors: {'yes' if has_sparse else 'no -> yes'}")
+    print(f"=" * 40 + "\n")
+
+    if target_size > current_size:
+        print("❌ Cannot increase dimensions from stored vectors - re-ingest the catalog instead")
+        sys.exit(1)
+
+    if dry_run:
+        print("Dry run - no changes made")
+        return
+
+    if target_size == current_size and has_sparse:
+        # In-place: Qdrant (re)builds quantized vectors in the background
+        client.update_collection(
+            collection_name=source,
+            quantization_config=quantization_config() or Disabled.DISABLED,
+        )
+        print(f"✅ Quantization set to '{settings.QDRANT_QUANTIZATION}' on {source}")
+        return
+
+    target = f"{name}_{target_size}d_{int(time.time())}"
+    print(f"🔄 Copying points into {target}...")
+    copied = copy_with_dimensions(client, source, target, target_size)
+
+    expected = client.count(collection_name=source, exact=True).count
+    stored = client.count(collection_name=target, exact=True).count
+    if stored != expected:
+        print(f"❌ {target} has {stored} of {expected} points - {name} left unchanged")
+        sys.exit(1)
+
+    if source != name:
+        # Already an alias: switch atomically
+        client.update_collection_aliases(
+            change_aliases_operations=[
+                DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=name)),
+                CreateAliasOperation(create_alias=CreateAlias(collection_name=target, alias_name=name)),
+            ]
+        )
+        print(f"✅ Alias {name} -> {target} (old collection {source} kept; delete it when satisfied)")
+    else:
+        # Alias first, then drop the old collection, so the name always resolves
+        create_alias = CreateAliasOperation(create_alias=CreateAlias(collection_name=target, alias_name=name))
+        try:
+            client.update_collection_aliases(change_aliases_operations=[create_alias])
+            aliased = True
+        except Exception:
+            # Servers that refuse an alias named like an existing collection:
+            # the verified copy in target holds every point, so drop, then alias
+            aliased = False
+        client.delete_collection(source)
+        if not aliased:
+            try:
+                client.update_collection_aliases(change_aliases_operations=[create_alias])
+            except Exception:
+                print(f"❌ Could not alias {name} -> {target}; all points are in {target}, create the alias by hand")
+                raise
+        print(f"✅ Replaced collection {name} with alias -> {target}")
+
+    print(f"\n✨ Done! Migrated {copied} points to {target_size} dimensions")
+    print(f"Set EMBEDDING_DIMENSIONS={target_size} on the backend deployment.")
+    print("The next catalog sync re-embeds every product once (hashes include the dimensions).")
+
+
+if __name__ == "__main__":
+    main()
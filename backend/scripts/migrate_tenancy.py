@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Tenancy Migration Script
+Moves points from the shared collection into the layout set by QDRANT_TENANCY.
+
+Usage:
+    QDRANT_TENANCY=collection python scripts/migrate_tenancy.py [--drop-source]
+    QDRANT_TENANCY=shard_key python scripts/migrate_tenancy.py
+    python scripts/migrate_tenancy.py --dry-run
+
+collection: each tenant's points are copied into "<QDRANT_COLLECTION>__<tenant_id>".
+The shared collection is kept unless --drop-source is given.
+
+shard_key: an existing collection can't be resharded, so points are copied into a
+new custom-sharded collection (one shard key per tenant) and QDRANT_COLLECTION is
+pointed at it via an alias. If QDRANT_COLLECTION was a real collection rather than
+an alias, it is replaced by the alias; otherwise the old collection is kept unless
+--drop-source is given.
+
+Point IDs and payloads (including catalog versions) are copied unchanged, so the
+backend can switch to the new QDRANT_TENANCY as soon as the copy is done.
+"""
+
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from qdrant_client.models import (
+    PointStruct,
+    ShardingMethod,
+    CreateAlias,
+    CreateAliasOperation,
+    DeleteAlias,
+    DeleteAliasOperation,
+)
+
+from app.core.config import settings
+from app.services.vector_service import vector_service
+
+COPY_BATCH_SIZE = 256
+
+
+def resolve_alias(client, name: str) -> str | None:
+    """Return the collection an alias points to, or None if `name` is not an alias."""
+    for alias in client.get_aliases().aliases:
+        if alias.alias_name == name:
+            return alias.collection_name
+    return None
+
+
+def scroll_points(client, collection: str):
+    """Yield pages of points (with vectors and payload) from a collection."""
+    offset = None
+    while True:
+        records, offset = client.scroll(
+            collection_name=collection,
+            limit=COPY_BATCH_SIZE,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True,
+        )
+        if records:
+            yield records
+        if offset is None:
+            break
+
+
+def copy_points(client, source: str, target: str = None) -> Counter:
+    """
+    Copy every point from source into its tenant's location.
+
+    With `target`, points go into that custom-sharded collection under their
+    tenant's shard key; otherwise into each tenant's own collection.
+    Returns point counts per tenant.
+    """
+    copied = Counter()
+    for records in scroll_points(client, source):
+        by_tenant: dict[str, list[PointStruct]] = {}
+        for r in records:
+            tenant_id = vector_service._tenant_of(r.payload["tenant_id"])
+            by_tenant.setdefault(tenant_id, []).append(
+                PointStruct(id=r.id, vector=r.vector, payload=r.payload)
+            )
+
+        for tenant_id, points in by_tenant.items():
+            if target:
+                if tenant_id not in copied:
+                    client.create_shard_key(target, shard_key=tenant_id)
+                client.upsert(collection_name=target, points=points, shard_key_selector=tenant_id)
+            else:
+                vector_service._ensure_tenant(tenant_id)
+                client.upsert(**vector_service._target(tenant_id), points=points)
+            copied[tenant_id] += len(points)
+
+        print(f"   Copied {sum(copied.values())} points")
+    return copied
+
+
+def main():
+    dry_run = "--dry-run" in sys.argv
+    drop_source = "--drop-source" in sys.argv
+    client = vector_service.qdrant
+    name = settings.QDRANT_COLLECTION
+    tenancy = settings.QDRANT_TENANCY
+
+    source = resolve_alias(client, name) or name
+    if not client.collection_exists(source):
+        print(f"❌ Source collection {source} not found")
+        sys.exit(1)
+
+    print(f"\n🚀 Sift Retail AI - Tenancy Migration")
+    print(f"=" * 40)
+    print(f"Source: {source}")
+    print(f"Tenancy: {tenancy}")
+    print(f"Points: {client.count(source).count}")
+    print(f"=" * 40 + "\n")
+
+    if tenancy == "shared":
+        print("❌ Set QDRANT_TENANCY=shard_key or collection for the target layout")
+        sys.exit(1)
+
+    # Local mode has no async client and no sharding support
+    if tenancy == "shard_key" and vector_service.async_qdrant is None:
+        print("❌ Custom sharding needs a Qdrant server (set QDRANT_URL/QDRANT_API_KEY)")
+        sys.exit(1)
+
+    sharding = client.get_collection(source).config.params.sharding_method
+    if tenancy == "shard_key" and sharding == ShardingMethod.CUSTOM:
+        print("✅ Collection is already custom-sharded - nothing to do")
+        return
+
+    if dry_run:
+        print("Dry run - no changes made")
+        return
+
+    if tenancy == "collection":
+        copied = copy_points(client, source)
+    else:
+        target = f"{name}_sharded_{int(time.time())}"
+        print(f"🔄 Creating custom-sharded collection {target}...")
+        vector_service.tenancy = "shard_key"
+        vector_service._create_collection(target)
+        copied = copy_points(client, source, target)
+
+        operations = [CreateAliasOperation(create_alias=CreateAlias(collection_name=target, alias_name=name))]
+        if source != name:
+            # Already an alias: switch atomically
+            operations.insert(0, DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=name)))
+        else:
+            # A real collection can't share its name with an alias
+            client.delete_collection(source)
+        client.update_collection_aliases(change_aliases_operations=operations)
+        print(f"✅ Alias {name} -> {target}")
+
+    for tenant_id, count in sorted(copied.items()):
+        print(f"   {tenant_id}: {count} points")
+
+    if drop_source and client.collection_exists(source):
+        client.delete_collection(source)
+        print(f"🗑️  Deleted source collection {source}")
+
+    print(f"\n✨ Done! Migrated {sum(copied.values())} points for {len(copied)} tenants")
+    print(f"Set QDRANT_TENANCY={tenancy} on the backend deployment.")
+
+
+if __name__ == "__main__":
+    main()
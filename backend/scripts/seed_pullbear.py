@@ -146,6 +146,8 @@ def main():
             "id": p.external_id,
             "tenant_id": p.tenant_id,
             "name": p.name,
+            "brand": p.brand,
+            "sku": p.sku,
             "short_description": p.short_description or p.description[:200] if p.description else "",
             "price": p.price,
             "image_url": p.image_url,
@@ -155,10 +157,14 @@ def main():
             "combined_text": p.embedding_text,  # Use the pre-built embedding text
         })
 
-    # Generate embeddings and upsert
+    # Generate embeddings and sync (only changed products are re-written,
+    # products no longer in the catalog are removed)
     try:
-        vector_count = vector.upsert_products_batch(vector_products)
-        print(f"  - Stored {vector_count} products in vector database")
+        stats = vector.sync_tenant_products(tenant_id, vector_products)
+        print(
+            f"  - Vector database: {stats['upserted']} upserted, {stats['unchanged']} unchanged, "
+            f"{stats['deleted']} removed, {stats['failed']} failed"
+        )
     except Exception as e:
         print(f"  - Warning: Vector storage failed: {e}")
         print("    (Products are in Supabase, but vector search won't work)")
@@ -0,0 +1,8 @@
+"""Offline settings: local embeddings and an in-memory Qdrant, set before app imports."""
+
+import os
+
+os.environ.setdefault("EMBEDDING_PROVIDER", "hashing")
+os.environ.setdefault("QDRANT_LOCAL_PATH", ":memory:")
+os.environ.setdefault("EMBEDDING_STORE_ENABLED", "false")
+os.environ.setdefault("HOT_REPLICA_ENABLED", "false")
@@ -0,0 +1,64 @@
+"""Tests for attribute normalization and attribute payloads/filters."""
+
+from app.services.attributes import normalize_attribute_value
+from app.services.query_service import QueryConstraints
+from app.services.vector_service import vector_service
+
+
+class TestNormalizeAttributeValue:
+    """Tests for normalize_attribute_value."""
+
+    def test_closed_vocabulary_term(self):
+        """Test that free-form values map onto one vocabulary term."""
+        assert normalize_attribute_value("color", "Light Blue") == "blue"
+        assert normalize_attribute_value("color", "Grey") == "gray"
+        assert normalize_attribute_value("material", "100% Cotton") == "cotton"
+        assert normalize_attribute_value("gender", "Women's") == "women"
+
+    def test_ambiguous_or_unknown_value(self):
+        """Test that values naming several or no terms have no canonical form."""
+        assert normalize_attribute_value("color", "navy blue") is None
+        assert normalize_attribute_value("color", "teal") is None
+
+    def test_open_attribute(self):
+        """Test that open attributes are only lowercased."""
+        assert normalize_attribute_value("style", "  Smart  Casual ") == "smart casual"
+
+
+class TestAttributePayload:
+    """Tests for attribute payload fields."""
+
+    def test_not_enriched(self):
+        """Test that products without extraction get no attribute fields."""
+        assert vector_service._attribute_payload({"attributes": None}) == {}
+        assert vector_service._attribute_payload({}) == {}
+
+    def test_confident_normalized_values(self):
+        """Test that only confident, normalizable values are stored."""
+        payload = vector_service._attribute_payload({"attributes": {
+            "color": {"value": "Navy Blue", "confidence": 0.95},
+            "material": {"value": "100% cotton", "confidence": 0.9},
+            "style": {"value": "Casual", "confidence": 0.9},
+            "pattern": {"value": "striped", "confidence": 0.5},
+        }})
+        assert payload == {
+            "material": "cotton",
+            "style": "casual",
+            "attribute_confidence": {"material": 0.9, "style": 0.9},
+        }
+
+    def test_enriched_without_attributes(self):
+        """Test that enriched products without attributes are marked as such."""
+        assert vector_service._attribute_payload({"attributes": {}}) == {"attribute_confidence": {}}
+
+
+class TestAttributeFilters:
+    """Tests for attribute conditions in QueryConstraints.to_qdrant_filters."""
+
+    def test_vocabulary_constraint_filters(self):
+        """Test that a color constraint adds one attribute filter."""
+        assert len(QueryConstraints(color="Blue").to_qdrant_filters()) == 1
+
+    def test_unknown_constraint_adds_no_filter(self):
+        """Test that constraints outside the vocabulary don't filter."""
+        assert QueryConstraints(color="teal", material="mesh").to_qdrant_filters() == []
@@ -0,0 +1,89 @@
+"""Tests for request coalescing and background cache refresh."""
+
+import asyncio
+
+import pytest
+
+from app.core.cache import Cache, SingleFlight
+
+
+class TestSingleFlight:
+    """Tests for SingleFlight coalescing."""
+
+    def test_concurrent_calls_share_one_execution(self):
+        """Test that callers for the same key get one result from one run."""
+        flights = SingleFlight("test")
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "value"
+
+        async def main():
+            return await asyncio.gather(*(flights.do("key", work) for _ in range(3)))
+
+        assert asyncio.run(main()) == ["value"] * 3
+        assert len(calls) == 1
+        assert flights.stats()["coalesced"] == 2
+
+    def test_cancelled_first_caller_does_not_cancel_followers(self):
+        """Test that followers still get the result when the first caller is cancelled."""
+        flights = SingleFlight("test")
+
+        async def work():
+            await asyncio.sleep(0.01)
+            return "value"
+
+        async def main():
+            leader = asyncio.create_task(flights.do("key", work))
+            await asyncio.sleep(0)
+            follower = asyncio.create_task(flights.do("key", work))
+            await asyncio.sleep(0)
+            leader.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+            return await follower
+
+        assert asyncio.run(main()) == "value"
+        assert flights.stats()["in_flight"] == 0
+
+    def test_exception_reaches_every_caller(self):
+        """Test that a failed run raises in each waiting caller."""
+        flights = SingleFlight("test")
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        async def main():
+            return await asyncio.gather(
+                flights.do("key", work), flights.do("key", work), return_exceptions=True
+            )
+
+        results = asyncio.run(main())
+        assert [type(r) for r in results] == [ValueError, ValueError]
+
+
+class TestBackgroundRefresh:
+    """Tests for Cache.refresh joining a coalesced run."""
+
+    def test_refresh_survives_cancelled_foreground_request(self):
+        """Test that a refresh sharing a run with a cancelled request still stores its value."""
+        cache = Cache(name="test")
+        flights = SingleFlight("test")
+
+        async def work():
+            await asyncio.sleep(0.01)
+            return "fresh"
+
+        async def main():
+            request = asyncio.create_task(flights.do("key", work))
+            await asyncio.sleep(0)
+            cache.refresh("key", lambda: flights.do("key", work), ttl=60)
+            await asyncio.sleep(0)
+            request.cancel()
+            await asyncio.sleep(0.05)
+            return await cache.get("key")
+
+        assert asyncio.run(main()) == "fresh"
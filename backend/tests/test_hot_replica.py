@@ -0,0 +1,85 @@
+"""Tests for hot replica freshness across catalog revisions."""
+
+import asyncio
+import uuid
+
+import pytest
+
+from app.services.hot_replica import HotReplicaCache, TenantReplica
+from app.services.vector_service import vector_service
+from tests.test_vector_service import make_product
+
+
+def empty_replica() -> TenantReplica:
+    return TenantReplica([], [], [], [])
+
+
+class TestHotReplicaCacheRevisions:
+    """Tests for revision tracking in HotReplicaCache."""
+
+    def test_replica_served_only_at_its_revision(self):
+        """Test that a replica loaded at one revision isn't served for another."""
+        cache = HotReplicaCache()
+        generation = cache.begin_load("t", "r1")
+        cache.put("t", empty_replica(), generation, "r1")
+
+        assert cache.get("t", "r1") is not None
+        assert cache.get("t", "r2") is None
+        assert cache.begin_load("t", "r1") is None
+        assert cache.begin_load("t", "r2") is not None
+
+    def test_own_write_advances_current_replica(self):
+        """Test that a local write's revision keeps a current replica servable."""
+        cache = HotReplicaCache()
+        cache.put("t", empty_replica(), cache.begin_load("t", "r1"), "r1")
+
+        cache.advance_revision("t", "r1", "r2")
+
+        assert cache.get("t", "r2") is not None
+
+    def test_own_write_does_not_advance_stale_replica(self):
+        """Test that a replica already behind another process's write stays stale."""
+        cache = HotReplicaCache()
+        cache.put("t", empty_replica(), cache.begin_load("t", "r1"), "r1")
+
+        cache.advance_revision("t", "r2", "r3")
+
+        assert cache.get("t", "r3") is None
+
+
+@pytest.fixture
+def tenant_id(monkeypatch):
+    monkeypatch.setattr(vector_service, "hot_replicas", HotReplicaCache())
+    tenant_id = f"test_{uuid.uuid4().hex[:8]}"
+    yield tenant_id
+    vector_service.delete_tenant_products(tenant_id)
+
+
+class TestSearchWithHotReplica:
+    """Tests for VectorService searches served from hot replicas."""
+
+    def test_write_by_another_process_is_visible(self, tenant_id, monkeypatch):
+        """Test that a replica missing another process's write falls back to Qdrant."""
+        tee = make_product(tenant_id, "1")
+        jacket = {**make_product(tenant_id, "2"), "name": "Denim Jacket", "combined_text": "Denim Jacket. Blue denim"}
+        vector_service.sync_tenant_products(tenant_id, [tee])
+
+        async def search_ids():
+            results = await vector_service.search("denim jacket", tenant_id, score_threshold=None)
+            return {r["product_id"] for r in results}
+
+        async def main():
+            await search_ids()
+            await asyncio.gather(*vector_service._replica_loads)
+            assert await search_ids() == {"1"}
+            assert vector_service.hot_replicas.hits == 1
+
+            # Another process adds a product: this one's replica and version cache don't see it
+            with monkeypatch.context() as m:
+                m.setattr(vector_service, "hot_replicas", None)
+                vector_service.sync_tenant_products(tenant_id, [tee, jacket])
+            vector_service._active_versions.pop(tenant_id)
+
+            return await search_ids()
+
+        assert asyncio.run(main()) == {"1", "2"}
@@ -0,0 +1,74 @@
+"""Tests for the CSV ingestion script's full sync."""
+
+import uuid
+
+import pytest
+
+from app.core.config import settings
+from app.services.vector_service import vector_service
+from scripts import ingest
+
+
+class RecordingDB:
+    """Stands in for db_service; records the calls the script makes."""
+
+    def __init__(self):
+        self.calls = []
+
+    def upsert_products_batch(self, products):
+        self.calls.append(("upsert", [p["id"] for p in products]))
+        return len(products)
+
+    def delete_stale_products(self, tenant_id, keep_ids):
+        self.calls.append(("delete_stale", keep_ids))
+        return 0
+
+
+@pytest.fixture
+def tenant_id():
+    tenant_id = f"test_{uuid.uuid4().hex[:8]}"
+    yield tenant_id
+    vector_service.delete_tenant_products(tenant_id)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = RecordingDB()
+    monkeypatch.setattr(ingest, "db_service", db)
+    monkeypatch.setattr(settings, "CATALOG_VERSION_CACHE_TTL", 0)
+    return db
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "products.csv"
+    path.write_text(
+        "id,name,description,price,category\n"
+        "12345,Classic Tee,Soft cotton tee,10,Tops\n"
+        "67890,Denim Jacket,Blue denim jacket,60,Outerwear\n"
+    )
+    return str(path)
+
+
+class TestIngestCsv:
+    """Tests for ingest_csv publishing and stale product cleanup."""
+
+    def test_complete_build_publishes_then_deletes_stale(self, tenant_id, db, csv_path):
+        """Test that stale products are removed by the CSV's IDs after publishing."""
+        count = ingest.ingest_csv(csv_path, tenant_id)
+
+        assert count == 2
+        assert vector_service.get_catalog_version(tenant_id)["active_version"]
+        assert db.calls[-1] == ("delete_stale", ["12345", "67890"])
+
+    def test_partial_build_is_discarded(self, tenant_id, db, csv_path, monkeypatch):
+        """Test that a build missing products isn't published and deletes nothing."""
+        monkeypatch.setattr(vector_service, "upsert_products_batch", lambda batch, version=None: len(batch) - 1)
+
+        count = ingest.ingest_csv(csv_path, tenant_id)
+
+        state = vector_service.get_catalog_version(tenant_id)
+        assert count == 0
+        assert not state.get("active_version")
+        assert not state.get("staging_version")
+        assert [call[0] for call in db.calls] == ["upsert"]
@@ -0,0 +1,35 @@
+"""Tests for rule-based query parsing and LLM escalation."""
+
+from app.core.config import settings
+from app.services.query_service import QueryService
+
+
+class TestRuleConfidence:
+    """Tests for _rule_confidence."""
+
+    def setup_method(self):
+        self.service = QueryService(use_llm=False)
+
+    def confidence(self, query: str) -> float:
+        return self.service._rule_confidence(query, self.service._simple_parse(query))
+
+    def test_fully_parsed_query(self):
+        """Test that a query the rules fully explain is confident."""
+        assert self.confidence("blue shoes for men under $50") == 1.0
+
+    def test_second_color_escalates(self):
+        """Test that a color the parser dropped ("blue") lowers confidence."""
+        assert self.service._simple_parse("red or blue shirt").color == "red"
+        assert self.confidence("red or blue shirt") < settings.QUERY_RULES_MIN_CONFIDENCE
+
+    def test_second_gender_escalates(self):
+        """Test that a gender the parser dropped lowers confidence."""
+        assert self.confidence("shoes for men or women") < settings.QUERY_RULES_MIN_CONFIDENCE
+
+    def test_second_category_escalates(self):
+        """Test that a category the parser dropped lowers confidence."""
+        assert self.confidence("shirt and pants") < settings.QUERY_RULES_MIN_CONFIDENCE
+
+    def test_synonyms_of_one_gender_stay_confident(self):
+        """Test that several words for the same gender don't lower confidence."""
+        assert self.confidence("womens ladies dress") == 1.0
@@ -0,0 +1,105 @@
+"""Tests for VectorService writes and search."""
+
+import asyncio
+import uuid
+
+import pytest
+
+from app.core.config import settings
+from app.services.vector_service import vector_service
+
+
+def make_product(tenant_id: str, product_id: str = "1", price: float = 10.0) -> dict:
+    return {
+        "id": product_id,
+        "tenant_id": tenant_id,
+        "name": "Classic Tee",
+        "brand": "",
+        "sku": "",
+        "price": price,
+        "short_description": "Soft cotton tee",
+        "image_url": "",
+        "permalink": "",
+        "categories": ["Tops"],
+        "stock_status": "instock",
+        "combined_text": "Classic Tee. Soft cotton tee",
+    }
+
+
+def stored_price(tenant_id: str, product_id: str) -> float:
+    point_id = vector_service._point_id(vector_service._namespace(tenant_id), product_id)
+    [record] = vector_service.qdrant.retrieve(
+        **vector_service._target(tenant_id), ids=[point_id], with_payload=["price"]
+    )
+    return record.payload["price"]
+
+
+@pytest.fixture
+def tenant_id():
+    tenant_id = f"test_{uuid.uuid4().hex[:8]}"
+    yield tenant_id
+    vector_service.delete_tenant_products(tenant_id)
+
+
+class TestUpdatePayload:
+    """Tests for price/stock updates without re-embedding."""
+
+    def test_update_sets_price(self, tenant_id):
+        """Test that a payload update changes the stored price."""
+        vector_service.sync_tenant_products(tenant_id, [make_product(tenant_id)])
+
+        result = vector_service.update_payload(tenant_id, [{"id": "1", "price": 12}])
+
+        assert result == {"updated": 1, "not_found": []}
+        assert stored_price(tenant_id, "1") == 12.0
+
+    def test_sync_after_update_restores_catalog_price(self, tenant_id):
+        """Test that the next sync overwrites a manual price edit."""
+        vector_service.sync_tenant_products(tenant_id, [make_product(tenant_id)])
+        vector_service.update_payload(tenant_id, [{"id": "1", "price": 12}])
+
+        stats = vector_service.sync_tenant_products(tenant_id, [make_product(tenant_id, price=10.0)])
+
+        assert stats["upserted"] == 1
+        assert stored_price(tenant_id, "1") == 10.0
+
+    def test_unknown_product_not_found(self, tenant_id):
+        """Test that updates for missing products are reported."""
+        vector_service.sync_tenant_products(tenant_id, [make_product(tenant_id)])
+
+        result = vector_service.update_payload(tenant_id, [{"id": "missing", "price": 5}])
+
+        assert result == {"updated": 0, "not_found": ["missing"]}
+
+
+class TestHybridSearch:
+    """Tests for hybrid (dense + lexical) search scoring."""
+
+    def test_threshold_applies_to_weak_lexical_hits(self, tenant_id, monkeypatch):
+        """Test that lexical matches outside the best few are held to score_threshold."""
+        monkeypatch.setattr(settings, "HYBRID_LEXICAL_TOP_N", 0)
+        vector_service.sync_tenant_products(tenant_id, [make_product(tenant_id)])
+
+        [hit] = asyncio.run(vector_service.search("tee", tenant_id, score_threshold=None, mode="hybrid"))
+        filtered = asyncio.run(
+            vector_service.search("tee", tenant_id, score_threshold=hit["score"] + 0.01, mode="hybrid")
+        )
+
+        assert 0 < hit["score"] < 1
+        assert filtered == []
+
+    def test_exact_sku_survives_default_threshold(self, tenant_id):
+        """Test that an exact SKU match is returned despite its low dense similarity."""
+        products = [
+            {**make_product(tenant_id, str(i)), "name": name, "sku": sku, "combined_text": f"{name}. {text}"}
+            for i, (name, sku, text) in enumerate([
+                ("Classic Tee", "CT-1001", "Soft cotton tee"),
+                ("Trail Backpack", "PB-4420", "Water-resistant 30L pack"),
+                ("Denim Jacket", "DJ-7781", "Blue denim jacket"),
+            ])
+        ]
+        vector_service.sync_tenant_products(tenant_id, products)
+
+        results = asyncio.run(vector_service.search("PB-4420", tenant_id, mode="hybrid"))
+
+        assert results and results[0]["product_id"] == "1"